@@ -0,0 +1,175 @@
+import argparse
+import glob
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from html import escape
+
+import main as wrx
+
+
+_tables = None
+
+
+def _initWorker(tables):
+    # Tables are pickled once per worker instead of once per log
+    global _tables
+    _tables = tables
+
+
+def _processLog(log_file, out_file, chunksize, use_store, lazy, max_points, cache, lags):
+    return wrx.analyzeLog(log_file, _tables, out_file, chunksize, use_store, lazy, max_points=max_points, cache=cache, lags=lags)
+
+
+def findLogs(target):
+    if os.path.isdir(target):
+        target = os.path.join(target, "*.csv")
+    return sorted(glob.glob(target))
+
+
+def runBatch(log_files, tables, out_dir, workers=None, max_pending=None, chunksize=None, use_store=False, lazy=False, max_points=None, cache=None, lags=None):
+    workers = workers or os.cpu_count() or 1
+    # Bounded queue: only a couple of logs per worker are ever in flight, so
+    # memory stays flat no matter how many files are in the folder
+    max_pending = max_pending or workers * 2
+    os.makedirs(out_dir, exist_ok=True)
+
+    results = {}
+    pending = {}
+    queue = iter(log_files)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(tables,)) as pool:
+        while True:
+            while len(pending) < max_pending:
+                log_file = next(queue, None)
+                if log_file is None:
+                    break
+                out_file = os.path.join(out_dir, os.path.splitext(os.path.basename(log_file))[0] + ".html")
+                pending[pool.submit(_processLog, log_file, out_file, chunksize, use_store, lazy, max_points, cache, lags)] = (log_file, out_file)
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                log_file, out_file = pending.pop(future)
+                try:
+                    results[log_file] = (out_file, future.result(), None)
+                    print(f"✅ {log_file}: {len(results[log_file][1])} runs")
+                except Exception as e:
+                    results[log_file] = (out_file, [], e)
+                    print(f"❌ {log_file}: {e}")
+
+    # Keep the index in input order regardless of completion order
+    return [(log_file, *results[log_file]) for log_file in log_files]
+
+
+def writeIndex(out_dir, results):
+    rows_html = ""
+    for log_file, out_file, runs, error in results:
+        name = escape(os.path.basename(log_file))
+        if error is not None:
+            rows_html += f"""
+          <tr class="error"><td>{name}</td><td colspan="6">{escape(str(error))}</td></tr>"""
+            continue
+        samples = sum(run['samples'] for run in runs)
+        knock = sum(run['knock_samples'] for run in runs)
+        # runs from a watch manifest written before knock events have none
+        events = sum(len(run['knock_events'].run) if 'knock_events' in run else 0 for run in runs)
+        peak_boost = max((run['peak_boost'] for run in runs), default=float('nan'))
+        peak_load = max((run['peak_load'] for run in runs), default=float('nan'))
+        link = escape(os.path.relpath(out_file, out_dir))
+        rows_html += f"""
+          <tr class="{ 'knock' if knock else '' }">
+            <td><a href="{link}">{name}</a></td>
+            <td>{len(runs)}</td><td>{samples}</td><td>{knock}</td><td>{events}</td>
+            <td>{peak_boost:.2f}</td><td>{peak_load:.2f}</td>
+          </tr>"""
+
+    # VE across every run of every log, still one cell per ROM table cell
+    ve_grids = [run['ve'] for _, _, runs, _ in results for run in runs]
+    ve_html = ""
+    if ve_grids:
+        fig_ve = wrx.make_annotated_heatmap(wrx.veTable(wrx.mergeVE(ve_grids)), "Volumetric Efficiency (VE %), all runs", colorscale='Spectral_r')
+        ve_html = fig_ve.to_html(full_html=False, include_plotlyjs='cdn')
+
+    # Per-cell knock, knock correction and AFR error over every run, also
+    # saved so later sessions can be merged into it
+    cell_stats = [run['cells'] for _, _, runs, _ in results for run in runs if 'cells' in run]
+    stats_html = ""
+    if cell_stats:
+        stats = wrx.mergeCellStats(cell_stats)
+        wrx.saveCellStats(os.path.join(out_dir, "cell_stats.npz"), stats)
+        stats_figs = [
+            wrx.make_annotated_heatmap(wrx.cellStatsTable(stats, 'events'), "Knock events per cell, all runs", colorscale='Reds'),
+            wrx.make_annotated_heatmap(wrx.cellStatsTable(stats, 'FBKC', 'min'), "Minimum FBKC (degrees), all runs", colorscale='Reds_r'),
+            wrx.make_annotated_heatmap(wrx.cellStatsTable(stats, 'AFR error'), "Mean WBO2 - Est AFR, all runs", colorscale='RdBu'),
+        ]
+        # plotly.js normally comes with the VE chart; load it here otherwise
+        stats_html = "".join(fig.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 and not ve_html else False)
+                             for i, fig in enumerate(stats_figs))
+
+    page_html = f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+      <meta charset="utf-8"/>
+      <title>WRX WOT Batch Summary</title>
+      <style>
+        body {{ font-family: Arial, sans-serif; margin: 12px; }}
+        table {{ border-collapse: collapse; }}
+        th, td {{ border: 1px solid #ccc; padding: 6px 10px; text-align: right; }}
+        th:first-child, td:first-child {{ text-align: left; }}
+        tr.knock td {{ background: #ffe5e5; }}
+        tr.error td {{ color: #b00020; }}
+      </style>
+    </head>
+    <body>
+      <h1>WRX WOT Batch Summary</h1>
+      <table>
+        <tr>
+          <th>Log</th><th>WOT runs</th><th>WOT samples</th><th>Knock samples</th><th>Knock events</th>
+          <th>Peak boost (psi)</th><th>Peak load (g/rev)</th>
+        </tr>{rows_html}
+      </table>
+      {ve_html}
+      {stats_html}
+    </body>
+    </html>
+    """
+
+    index_file = os.path.join(out_dir, "index.html")
+    with open(index_file, "w", encoding="utf-8") as f:
+        f.write(page_html)
+    return index_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze every RomRaider log in a folder in parallel.")
+    parser.add_argument("logs", help="directory of CSV logs or a glob such as 'Logs/*_wot.csv'")
+    parser.add_argument("--rom", default="C:/WRX/wrx_rom_tables.xlsx", help="ROM tables workbook")
+    parser.add_argument("--out", default="reports", help="output directory for the reports and index.html")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=None, help="stream each log in chunks of this many rows")
+    parser.add_argument("--store", action="store_true", help="reuse the columnar copy of each log instead of re-parsing the CSV")
+    parser.add_argument("--lazy", action="store_true", help="build each run's charts only when its tab is first opened")
+    parser.add_argument("--max-points", type=int, default=None, help="decimate each boost/load trace to about this many points")
+    parser.add_argument("--wbo2-lag", default=None, metavar="MS|auto",
+                        help="shift the wideband earlier by this many ms, or 'auto' to estimate the lag per log")
+    parser.add_argument("--no-cache", action="store_true", help="always re-read the ROM workbook and rebuild every figure")
+    args = parser.parse_args()
+    wrx.checkRom(parser, args.rom)
+
+    log_files = findLogs(args.logs)
+    if not log_files:
+        print(f"❌ No logs found in {args.logs}. Exiting.")
+        return
+
+    print(f"📁 Processing {len(log_files)} logs")
+    tables = wrx.loadTables(args.rom, cache_dir=None if args.no_cache else wrx.CACHE_DIR)
+    cache = None if args.no_cache else wrx.FigureCache()
+    results = runBatch(log_files, tables, args.out, workers=args.workers, chunksize=args.chunksize, use_store=args.store, lazy=args.lazy,
+                       max_points=args.max_points, cache=cache, lags=wrx.wbo2Lags(args.wbo2_lag))
+    index_file = writeIndex(args.out, results)
+    print(f"✅ Saved batch summary to {index_file}")
+
+
+if __name__ == "__main__":
+    main()
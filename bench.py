@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import plotly
+
+import main as wrx
+
+
+# Same columns, in the same order, as the RomRaider logs in Logs/
+LOG_COLUMNS = [
+    "Time (msec)",
+    "Engine Load* (g/rev)",
+    "Engine Speed (rpm)",
+    "Feedback Knock Correction* (degrees)",
+    "Fine Learning Knock Correction* (degrees)",
+    "Fueling Final Base* (estimated AFR)",
+    "Ignition Total Timing (degrees)",
+    "Intake Air Temperature (F)",
+    "Intake VVT Advance Angle Left (degrees)",
+    "Manifold Relative Pressure (psi)",
+    "Mass Airflow Sensor Voltage (V)",
+    "Primary Wastegate Duty Cycle (%)",
+    "Throttle Opening Angle (%)",
+    "AEM UEGO Wideband [9600 baud] (AFR Gasoline)",
+]
+
+LOAD_AXIS = [round(0.2 * i, 2) for i in range(1, 15)]
+RPM_AXIS = list(range(800, 7201, 400))
+BOOST_AXIS = [25.0, 50.0, 75.0, 100.0]
+
+
+def syntheticLog(rows, seed=0, iat_unit='F', wbo2_lag_ms=0.0):
+    # Cruise punctuated by 3-7 s WOT pulls from ~2500 to ~6500 rpm, sampled
+    # every ~48 ms with jitter, and knock on roughly a third of the pulls.
+    # The wideband trails Est AFR by wbo2_lag_ms, like the serial AEM gauge.
+    rng = np.random.default_rng(seed)
+    time_ms = np.cumsum(np.clip(rng.normal(48, 3, rows), 40, 60)).astype(np.int64) - 48
+
+    # Lay out pull [start, end) ranges separated by cruise gaps
+    n_guess = rows // 400 + 2
+    gaps = rng.integers(300, 1500, n_guess)
+    gaps[0] = rng.integers(20, 200)
+    lengths = rng.integers(60, 140, n_guess)
+    starts = np.cumsum(gaps + np.r_[0, lengths[:-1]])
+    keep = starts + lengths < rows
+    starts, lengths = starts[keep], lengths[keep]
+
+    wot = np.zeros(rows, dtype=bool)
+    progress = np.zeros(rows)
+    for start, length in zip(starts, lengths):
+        wot[start:start + length] = True
+        progress[start:start + length] = np.linspace(0, 1, length)
+
+    noise = lambda scale: rng.normal(0, scale, rows)
+    cruise_rpm = 2500 + 600 * np.sin(np.arange(rows) / 500) + noise(60)
+    cruise_load = 0.5 + 0.25 * np.sin(np.arange(rows) / 350) + noise(0.03)
+    spool = np.minimum(1, progress * 2.5)
+
+    rpm = np.where(wot, 2500 + 4000 * progress + noise(30), cruise_rpm)
+    load = np.where(wot, 1.0 + 1.25 * spool + noise(0.03), cruise_load)
+    mrp = np.where(wot, -2 + 17 * spool + noise(0.2), -10 + 10 * cruise_load + noise(0.2))
+    est_afr = np.where(wot, 11.6 - 0.8 * spool, 14.7 + noise(0.1))
+    wbo2 = np.interp(time_ms - wbo2_lag_ms, time_ms, est_afr) + noise(0.15)
+    timing = np.where(wot, 12 + 8 * progress + noise(0.5), 30 + 10 * (1 - cruise_load) + noise(0.5))
+    avcs = np.where(wot, 25 - 15 * progress, 10 + 20 * cruise_load) + noise(0.5)
+    maf_v = 1.2 + 1.3 * load + noise(0.02)
+    throttle = np.where(wot, 100.0, np.clip(12 + 10 * cruise_load + noise(2), 0, 60))
+    wgdc = np.where(wot, 60 + 30 * spool, 0.0)
+
+    fbkc = np.zeros(rows)
+    flkc = np.zeros(rows)
+    for start, length in zip(starts, lengths):
+        if rng.random() < 0.33:
+            at = start + rng.integers(length // 3, length - 8)
+            fbkc[at:at + rng.integers(3, 8)] = -1.41
+        if rng.random() < 0.1:
+            flkc[start + length // 2:start + length] = -0.35
+
+    iat_f = 80 + 10 * np.sin(np.arange(rows) / 5000) + noise(0.5)
+    iat = iat_f if iat_unit == 'F' else (iat_f - 32) * 5 / 9
+
+    columns = list(LOG_COLUMNS)
+    if iat_unit != 'F':
+        columns[columns.index("Intake Air Temperature (F)")] = "Intake Air Temperature (C)"
+
+    values = [time_ms, load, rpm.round(), fbkc, flkc, est_afr, timing, iat, avcs.round(), mrp, maf_v, wgdc, throttle, wbo2]
+    return pd.DataFrame({col: np.round(v, 2) for col, v in zip(columns, values)})
+
+
+def syntheticSheet(cols, rows, values):
+    # Same layout pd.read_excel returns for a ROM table pasted from RomRaider
+    top = [list(cols) + [np.nan]]
+    body = [[r] + list(v) for r, v in zip(rows, values)]
+    return pd.DataFrame(top + body, columns=['table'] + [f'c{i}' for i in range(len(cols))])
+
+
+def syntheticTables(seed=0):
+    rng = np.random.default_rng(seed)
+    load = np.array(LOAD_AXIS)[None, :]
+    rpm = np.array(RPM_AXIS)[:, None] / 1000
+    shape = (len(RPM_AXIS), len(LOAD_AXIS))
+
+    sheets = {
+        "base timing": np.round(38 - 9 * load + 1.5 * rpm + rng.normal(0, 0.3, shape), 2),
+        "kca": np.round(np.clip(4 - load, 0, 4) + rng.normal(0, 0.1, shape), 2),
+        "ol fueling": np.round(14.7 - 1.6 * load + rng.normal(0, 0.05, shape), 2),
+        "avcs groupn": np.round(np.clip(10 + 20 * load - 2 * rpm, 0, 35), 2),
+    }
+    base_timing, knock_advance, ol_fueling, avcs = [
+        wrx.formatTable(syntheticSheet(LOAD_AXIS, RPM_AXIS, sheets[name])) for name in ("base timing", "kca", "ol fueling", "avcs groupn")
+    ]
+    boost_values = np.round(np.array(BOOST_AXIS)[None, :] / 100 * np.clip(4 * rpm - 6, 0, 17), 2)
+    boost = wrx.formatTable(syntheticSheet(BOOST_AXIS, RPM_AXIS, boost_values))
+    return wrx.romTables(base_timing, knock_advance, ol_fueling, boost, avcs)
+
+
+def measure(fn, memory=True):
+    # Wall/CPU time from a clean call, peak Python-visible allocations from a
+    # second call under tracemalloc so its overhead doesn't skew the timings
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, {'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6), 'peak_bytes': peak}
+
+
+def benchSize(rows, tables, work_dir, max_runs=20, memory=True, iat_unit='F', wbo2_lag_ms=0.0):
+    log_file = os.path.join(work_dir, f"synthetic_{rows}_{iat_unit}_{wbo2_lag_ms:g}ms.csv")
+    if not os.path.exists(log_file):
+        syntheticLog(rows, iat_unit=iat_unit, wbo2_lag_ms=wbo2_lag_ms).to_csv(log_file, index=False)
+    out_file = os.path.join(work_dir, f"synthetic_{rows}_{iat_unit}.html")
+
+    stages = []
+
+    def record(stage, fn, items):
+        result, stats = measure(fn, memory)
+        stages.append({'rows': rows, 'stage': stage, 'items': items(result), **stats})
+        print(f"{rows:>10} {stage:<16} {stats['wall_s']:>10.4f} s {(stats['peak_bytes'] or 0) / 2**20:>10.1f} MiB")
+        return result
+
+    df = record('csv_load', lambda: wrx.readLog(log_file), len)
+    logs = record('getWOTruns', lambda: wrx.getWOTruns(df), len)
+    del df
+
+    total_timing, avcs = tables['total_timing'], tables['avcs']
+    record('getWOTparams', lambda: [wrx.getWOTparams(total_timing, log) for log in logs], len)
+    record('getKnocking', lambda: [wrx.getKnocking(total_timing, log) for log in logs], len)
+    record('getKnockEvents', lambda: [wrx.getKnockEvents(log) for log in logs], len)
+    record('getAVCS', lambda: [wrx.getAVCS(avcs, log) for log in logs], len)
+    record('getVE', lambda: [wrx.getVE(log, total_timing) for log in logs], len)
+    record('getTargets', lambda: [wrx.getTargets(log, tables) for log in logs], len)
+    # Also checks the estimate: the synthetic wideband trails by a known delay
+    lags = record('estimateLags', lambda: wrx.estimateLags(logs), len)
+    if 'WBO2' in lags:
+        lag = lags['WBO2']
+        stages[-1].update(true_lag_ms=wbo2_lag_ms, lag_ms=round(lag.lag_ms, 1), lag_r=round(lag.r, 3),
+                          lag_spread_ms=round(lag.spread_ms, 1), lag_applied=wrx.lagApplies(lag))
+        print(f"{'':>10} WBO2 lag {lag.lag_ms:.0f} ms (true {wbo2_lag_ms:g} ms, r={lag.r:.2f}, "
+              f"spread {lag.spread_ms:.0f} ms{'' if wrx.lagApplies(lag) else ', not applied'})")
+
+    # Figures and HTML scale with run count, not rows; cap them so the large
+    # sizes stay runnable, and record how many runs were actually rendered
+    shown = logs[:max_runs] if max_runs else logs
+    analyses = record('analyzeRun', lambda: [wrx.analyzeRun(i, log, tables) for i, log in enumerate(shown, 1)], len)
+    figs = record('figures', lambda: [wrx.buildRunFigures(analysis, tables) for analysis in analyses], len)
+    tabs = record('to_html', lambda: [wrx.renderRunTab(i, run_figs) for i, run_figs in enumerate(figs, 1)], len)
+    record('write', lambda: wrx.writeReport(out_file, "".join(b for b, _ in tabs), "".join(p for _, p in tabs)), lambda _: os.path.getsize(out_file))
+    return stages
+
+
+def gitRevision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each analysis stage on synthetic RomRaider logs.")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000,10000000", help="comma separated log sizes in rows")
+    parser.add_argument("--max-runs", type=int, default=20, help="runs to render in the figure/HTML stages (0 for all)")
+    parser.add_argument("--iat", choices=("F", "C"), default="F", help="log IAT in Fahrenheit or Celsius")
+    parser.add_argument("--wbo2-lag", type=float, default=250.0, help="delay of the synthetic wideband behind Est AFR in ms")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--work-dir", default=None, help="where synthetic logs are kept (default: a temp dir)")
+    parser.add_argument("--out", default="bench_results.json", help="machine-readable results file")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    tables = syntheticTables()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = args.work_dir or tmp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        for rows in sizes:
+            results.extend(benchSize(rows, tables, work_dir, args.max_runs, not args.no_memory, args.iat, args.wbo2_lag))
+
+    report = {
+        'revision': gitRevision(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plotly': plotly.__version__,
+        'max_runs': args.max_runs,
+        'iat_unit': args.iat,
+        'wbo2_lag_ms': args.wbo2_lag,
+        'results': results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"✅ Saved benchmark results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
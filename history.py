@@ -0,0 +1,359 @@
+import argparse
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+import batch
+import main as wrx
+
+
+# Every WOT run of every log ingested so far, with its summary, the timing
+# map cells it touched, the knock in each and every knock event. Logs are
+# keyed by path and content hash, so re-ingesting an unchanged log does
+# nothing. Each log is tagged with the ROM workbook revision (its sha256) it
+# was first ingested with; only an explicit retag changes that.
+DB_FILE = os.path.join(wrx.CACHE_DIR, "history.sqlite")
+
+# Bumped when what is stored per log changes; older databases are emptied on
+# open so the next ingest fills them in again
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    rom_sha256 TEXT NOT NULL,
+    taken_at TEXT NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    log_id INTEGER NOT NULL REFERENCES logs(id) ON DELETE CASCADE,
+    run INTEGER NOT NULL,
+    taken_at TEXT NOT NULL,
+    rom_sha256 TEXT NOT NULL,
+    samples INTEGER NOT NULL,
+    knock_samples INTEGER NOT NULL,
+    peak_boost REAL,
+    peak_load REAL,
+    max_rpm REAL
+);
+CREATE TABLE IF NOT EXISTS cells (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    rpm REAL NOT NULL,
+    load REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    knock INTEGER NOT NULL,
+    events INTEGER NOT NULL,
+    fbkc_min REAL
+);
+CREATE TABLE IF NOT EXISTS knock_events (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    start_ms REAL NOT NULL,
+    end_ms REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    fbkc REAL,
+    flkc REAL,
+    rpm REAL,
+    load REAL,
+    timing REAL,
+    afr REAL,
+    iat REAL
+);
+CREATE INDEX IF NOT EXISTS logs_taken ON logs(taken_at);
+CREATE INDEX IF NOT EXISTS runs_log ON runs(log_id);
+CREATE INDEX IF NOT EXISTS runs_taken ON runs(taken_at);
+CREATE INDEX IF NOT EXISTS runs_rom ON runs(rom_sha256, taken_at);
+CREATE INDEX IF NOT EXISTS cells_cell ON cells(rpm, load, knock);
+CREATE INDEX IF NOT EXISTS cells_run ON cells(run_id);
+CREATE INDEX IF NOT EXISTS knock_events_run ON knock_events(run_id);
+CREATE INDEX IF NOT EXISTS knock_events_cell ON knock_events(rpm, load);
+"""
+
+
+def connect(db_file=DB_FILE):
+    os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        with conn:
+            conn.execute("DELETE FROM logs")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def logTime(log_file):
+    # RomRaider names logs romraiderlog_YYYYMMDD_HHMMSS; fall back to mtime
+    match = re.search(r"(\d{8})_(\d{6})", os.path.basename(log_file))
+    if match:
+        try:
+            return datetime.strptime("".join(match.groups()), "%Y%m%d%H%M%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(log_file))
+
+
+def isCurrent(conn, log_file):
+    # Same size and mtime is taken as unchanged; otherwise the content hash
+    # decides, and a matching hash just refreshes the stamp
+    path = os.path.abspath(log_file)
+    row = conn.execute("SELECT id, size, mtime, sha256 FROM logs WHERE path = ?", (path,)).fetchone()
+    if row is None:
+        return False, None
+    stat = os.stat(path)
+    if (row['size'], row['mtime']) == (stat.st_size, stat.st_mtime_ns):
+        return True, None
+    digest = wrx.fileDigest(path)
+    if row['sha256'] == digest:
+        with conn:
+            conn.execute("UPDATE logs SET size = ?, mtime = ? WHERE id = ?", (stat.st_size, stat.st_mtime_ns, row['id']))
+        return True, None
+    return False, digest
+
+
+def runCells(stats):
+    # Only cells the run actually touched are stored
+    fbkc = wrx.cellStatsTable(stats, 'FBKC', 'min').to_numpy()
+    rows, cols = np.nonzero(stats.count)
+    for r, c in zip(rows, cols):
+        yield (float(stats.index[r]), float(stats.columns[c]), int(stats.count[r, c]), int(stats.knock[r, c]),
+               int(stats.events[r, c]), None if np.isnan(fbkc[r, c]) else float(fbkc[r, c]))
+
+
+def runEvents(events):
+    # float32 onset values are rounded so they compare cleanly in queries
+    def value(v):
+        return None if np.isnan(v) else round(float(v), 4)
+    for i in range(len(events.run)):
+        yield (float(events.start_ms[i]), float(events.end_ms[i]), int(events.samples[i]), value(events.fbkc[i]),
+               value(events.flkc[i]), value(events.rpm[i]), value(events.load[i]), value(events.timing[i]),
+               value(events.afr[i]), value(events.iat[i]))
+
+
+def ingestLog(conn, log_file, tables, rom_digest, retag=False):
+    # A log that grew since it was ingested keeps the ROM revision it was
+    # first tagged with; retag re-tags (and re-analyzes) it as rom_digest
+    path = os.path.abspath(log_file)
+    row = conn.execute("SELECT rom_sha256 FROM logs WHERE path = ?", (path,)).fetchone()
+    current, digest = isCurrent(conn, path)
+    if current and (not retag or row['rom_sha256'] == rom_digest):
+        return None
+    if row is not None and not retag:
+        if row['rom_sha256'] != rom_digest:
+            print(f"⚠️ {log_file}: keeping ROM revision {row['rom_sha256'][:12]} from its first ingest (--retag to change it)")
+        rom_digest = row['rom_sha256']
+
+    stat = os.stat(path)
+    digest = digest or wrx.fileDigest(path)
+    taken_at = f"{logTime(path):%Y-%m-%d %H:%M:%S}"
+    runs = wrx.getWOTruns(wrx.readLog(path))
+
+    # One transaction per log: a changed log's old runs and cells go with it
+    with conn:
+        conn.execute("DELETE FROM logs WHERE path = ?", (path,))
+        log_id = conn.execute(
+            "INSERT INTO logs (path, size, mtime, sha256, rom_sha256, taken_at, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, digest, rom_digest, taken_at, f"{datetime.now():%Y-%m-%d %H:%M:%S}"),
+        ).lastrowid
+        for i, log in enumerate(runs, 1):
+            analysis = wrx.analyzeRun(i, log, tables)
+            summary = analysis.summary
+            run_id = conn.execute(
+                "INSERT INTO runs (log_id, run, taken_at, rom_sha256, samples, knock_samples, peak_boost, peak_load, max_rpm)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (log_id, i, taken_at, rom_digest, summary['samples'], summary['knock_samples'],
+                 summary['peak_boost'], summary['peak_load'], summary['max_rpm']),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO cells (run_id, rpm, load, samples, knock, events, fbkc_min) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, *cell) for cell in runCells(analysis.cells)),
+            )
+            conn.executemany(
+                "INSERT INTO knock_events (run_id, start_ms, end_ms, samples, fbkc, flkc, rpm, load, timing, afr, iat)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, *event) for event in runEvents(analysis.knock_events)),
+            )
+    return len(runs)
+
+
+def resolveRom(conn, rom):
+    # A ROM workbook, or the sha256 (or a unique prefix of it) of a revision
+    # logs were ingested with, as listed by `roms`
+    if os.path.isfile(rom):
+        return wrx.fileDigest(rom)
+    if not re.fullmatch(r"[0-9a-fA-F]{4,64}", rom):
+        raise ValueError(f"{rom} is neither a ROM workbook nor a ROM revision")
+    digests = [row[0] for row in conn.execute("SELECT DISTINCT rom_sha256 FROM logs WHERE rom_sha256 LIKE ?", (rom.lower() + "%",))]
+    if len(digests) != 1:
+        raise ValueError(f"{'no' if not digests else 'more than one'} ingested ROM revision matches {rom}")
+    return digests[0]
+
+
+def queryRoms(conn):
+    # Every ROM revision logs were ingested with, oldest first
+    return conn.execute(
+        "SELECT l.rom_sha256, COUNT(DISTINCT l.id) AS logs, COUNT(r.id) AS runs, MIN(l.taken_at) AS first_taken,"
+        " MAX(l.taken_at) AS last_taken FROM logs l LEFT JOIN runs r ON r.log_id = l.id"
+        " GROUP BY l.rom_sha256 ORDER BY first_taken"
+    ).fetchall()
+
+
+def endOfDay(until):
+    # taken_at is 'YYYY-MM-DD HH:MM:SS', so a bare date has to cover the whole
+    # day to mean "on or before"
+    return f"{until} 23:59:59" if re.fullmatch(r"\d{4}-\d{2}-\d{2}", until) else until
+
+
+def queryRuns(conn, rpm=None, min_load=None, max_load=None, knock=False, since=None, until=None, rom=None, log=None):
+    # Runs matching every given filter; the cell filters (rpm, load range,
+    # knock) must all hold in one cell of the run
+    where, params = [], []
+    cell_where = []
+    if rpm is not None:
+        cell_where.append("c.rpm = ?")
+        params.append(float(rpm))
+    if min_load is not None:
+        cell_where.append("c.load >= ?")
+        params.append(float(min_load))
+    if max_load is not None:
+        cell_where.append("c.load <= ?")
+        params.append(float(max_load))
+    if knock:
+        cell_where.append("c.knock > 0")
+    if cell_where:
+        where.append(f"r.id IN (SELECT c.run_id FROM cells c WHERE {' AND '.join(cell_where)})")
+    if since is not None:
+        where.append("r.taken_at >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("r.taken_at <= ?")
+        params.append(endOfDay(until))
+    if rom is not None:
+        where.append("r.rom_sha256 = ?")
+        params.append(rom)
+    if log is not None:
+        where.append("l.path LIKE ?")
+        params.append(f"%{log}%")
+
+    sql = ("SELECT l.path, r.run, r.taken_at, r.samples, r.knock_samples, r.peak_boost, r.peak_load, r.max_rpm"
+           " FROM runs r JOIN logs l ON l.id = r.log_id")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY r.taken_at, l.path, r.run"
+    return conn.execute(sql, params).fetchall()
+
+
+def queryEvents(conn, min_rpm=None, max_rpm=None, min_load=None, max_load=None, max_fbkc=None, since=None, until=None,
+                rom=None, log=None):
+    # Knock events matching every given filter, worst correction first;
+    # rpm and load are taken at each event's onset
+    where, params = [], []
+    for sql, value in (("e.rpm >= ?", min_rpm), ("e.rpm <= ?", max_rpm), ("e.load >= ?", min_load),
+                       ("e.load <= ?", max_load), ("MIN(IFNULL(e.fbkc, 0), IFNULL(e.flkc, 0)) <= ?", max_fbkc),
+                       ("r.taken_at >= ?", since), ("r.taken_at <= ?", until and endOfDay(until)), ("r.rom_sha256 = ?", rom)):
+        if value is not None:
+            where.append(sql)
+            params.append(value)
+    if log is not None:
+        where.append("l.path LIKE ?")
+        params.append(f"%{log}%")
+
+    sql = ("SELECT l.path, r.run, r.taken_at, e.start_ms, e.end_ms, e.samples, e.fbkc, e.flkc, e.rpm, e.load,"
+           " e.timing, e.afr, e.iat FROM knock_events e JOIN runs r ON r.id = e.run_id JOIN logs l ON l.id = r.log_id")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY MIN(IFNULL(e.fbkc, 0), IFNULL(e.flkc, 0)), r.taken_at, l.path, r.run, e.start_ms"
+    return conn.execute(sql, params).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep every WOT run in a local database and query across all logs.")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="add new or changed logs")
+    ingest.add_argument("logs", help="directory of CSV logs, a glob such as 'Logs/*_wot.csv', or one log")
+    ingest.add_argument("--rom", default="C:/WRX/wrx_rom_tables.xlsx", help="ROM tables workbook the logs were taken on")
+    ingest.add_argument("--retag", action="store_true",
+                        help="re-tag logs already in the database with --rom; otherwise they keep the revision they were first ingested with")
+
+    commands.add_parser("roms", help="list the ROM revisions logs were ingested with")
+
+    query = commands.add_parser("query", help="list runs matching the filters")
+    query.add_argument("--rpm", type=float, default=None, help="timing map RPM breakpoint the run touched")
+    query.add_argument("--min-load", type=float, default=None, help="lowest g/rev breakpoint of the matching cell")
+    query.add_argument("--max-load", type=float, default=None, help="highest g/rev breakpoint of the matching cell")
+    query.add_argument("--knock", action="store_true", help="only cells with knock")
+    query.add_argument("--since", default=None, help="taken at or after this date (YYYY-MM-DD[ HH:MM:SS])")
+    query.add_argument("--until", default=None, help="taken at or before this date (a bare date includes the whole day)")
+    query.add_argument("--rom", default=None, help="only runs taken on this ROM workbook, or revision sha256 (prefix) from `roms`")
+    query.add_argument("--log", default=None, help="only logs whose path contains this text")
+
+    events = commands.add_parser("events", help="list knock events matching the filters, worst first")
+    events.add_argument("--min-rpm", type=float, default=None, help="lowest RPM at onset")
+    events.add_argument("--max-rpm", type=float, default=None, help="highest RPM at onset")
+    events.add_argument("--min-load", type=float, default=None, help="lowest g/rev at onset")
+    events.add_argument("--max-load", type=float, default=None, help="highest g/rev at onset")
+    events.add_argument("--max-fbkc", type=float, default=None, help="only events pulling at least this much, e.g. -2")
+    events.add_argument("--since", default=None, help="taken at or after this date (YYYY-MM-DD[ HH:MM:SS])")
+    events.add_argument("--until", default=None, help="taken at or before this date (a bare date includes the whole day)")
+    events.add_argument("--rom", default=None, help="only events taken on this ROM workbook, or revision sha256 (prefix) from `roms`")
+    events.add_argument("--log", default=None, help="only logs whose path contains this text")
+    args = parser.parse_args()
+    if args.command == "ingest":
+        wrx.checkRom(ingest, args.rom)
+
+    conn = connect(args.db)
+    if args.command == "ingest":
+        log_files = [args.logs] if os.path.isfile(args.logs) else batch.findLogs(args.logs)
+        tables = wrx.loadTables(args.rom)
+        rom_digest = wrx.fileDigest(args.rom)
+        for log_file in log_files:
+            runs = ingestLog(conn, log_file, tables, rom_digest, args.retag)
+            print(f"✅ {log_file}: {runs} runs" if runs is not None else f"⏭️ {log_file}: unchanged")
+        return
+
+    if args.command == "roms":
+        rows = queryRoms(conn)
+        print(f"{'revision':<12} {'logs':>5} {'runs':>5}  {'first taken':<20} last taken")
+        for row in rows:
+            print(f"{row['rom_sha256'][:12]:<12} {row['logs']:>5} {row['runs']:>5}  {row['first_taken']:<20} {row['last_taken']}")
+        print(f"{len(rows)} ROM revisions")
+        return
+
+    try:
+        rom = resolveRom(conn, args.rom) if args.rom else None
+    except ValueError as e:
+        parser.error(str(e))
+    if args.command == "events":
+        rows = queryEvents(conn, args.min_rpm, args.max_rpm, args.min_load, args.max_load, args.max_fbkc, args.since,
+                           args.until, rom, args.log)
+        print(f"{'taken at':<20} {'run':>4} {'time s':>8} {'dur ms':>6} {'FBKC':>6} {'FLKC':>6} {'rpm':>6} {'load':>5}"
+              f" {'timing':>6} {'AFR':>5} {'IAT C':>5}  log")
+        for row in rows:
+            cols = [f"{row[name]:>{width}.{digits}f}" if row[name] is not None else f"{'':>{width}}"
+                    for name, width, digits in (('fbkc', 6, 2), ('flkc', 6, 2), ('rpm', 6, 0), ('load', 5, 2),
+                                                ('timing', 6, 2), ('afr', 5, 2), ('iat', 5, 0))]
+            print(f"{row['taken_at']:<20} {row['run']:>4} {row['start_ms'] / 1000:>8.2f} {row['end_ms'] - row['start_ms']:>6.0f} "
+                  f"{' '.join(cols)}  {row['path']}")
+        print(f"{len(rows)} knock events")
+        return
+
+    rows = queryRuns(conn, args.rpm, args.min_load, args.max_load, args.knock, args.since, args.until, rom, args.log)
+    print(f"{'taken at':<20} {'run':>4} {'samples':>8} {'knock':>6} {'boost':>7} {'load':>6}  log")
+    for row in rows:
+        print(f"{row['taken_at']:<20} {row['run']:>4} {row['samples']:>8} {row['knock_samples']:>6} "
+              f"{row['peak_boost']:>7.2f} {row['peak_load']:>6.2f}  {row['path']}")
+    print(f"{len(rows)} runs")
+
+
+if __name__ == "__main__":
+    main()
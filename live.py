@@ -0,0 +1,217 @@
+import argparse
+import csv
+import io
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+import main as wrx
+
+
+class LiveLog:
+    # Tails a RomRaider CSV that is still being written. Each poll() reads only
+    # the bytes appended since the last one (up to the last complete line) and
+    # feeds them through a WOTRunSplitter, returning the runs that closed.
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.columns = None
+        self.usecols = None
+        self.dtype = None
+        self.rows = 0
+        self.splitter = wrx.WOTRunSplitter()
+
+    def poll(self):
+        size = os.path.getsize(self.log_file)
+        if size < self.offset:
+            # Truncated or replaced by a new session: start over
+            self.reset()
+        if size == self.offset:
+            return []
+
+        with open(self.log_file, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+        data = data[:end + 1]
+        self.offset += len(data)
+
+        if self.columns is None:
+            header, _, data = data.partition(b"\n")
+            header = next(csv.reader([header.decode("utf-8-sig").strip()]))
+            self.columns, self.usecols, self.dtype = wrx.logColumns(header)
+            if not data.strip():
+                return []
+
+        chunk = pd.read_csv(io.BytesIO(data), header=None, names=self.columns, usecols=self.usecols, dtype=self.dtype, skip_blank_lines=True)
+        self.rows += len(chunk)
+        return self.splitter.feed(chunk)
+
+
+class LivePage:
+    # Latest rendered page plus a version counter the browser polls
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.html = ""
+
+    def update(self, html):
+        with self.lock:
+            self.version += 1
+            self.html = html.replace("__VERSION__", str(self.version))
+
+    def get(self):
+        with self.lock:
+            return self.version, self.html
+
+
+def serve(page, host, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            version, html = page.get()
+            body = str(version) if self.path == "/version" else html
+            body = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain" if self.path == "/version" else "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def renderLiveRun(log, tables):
+    # Only what matters right after lifting off: knock cells, VE and boost
+    analysis = wrx.analyzeRun(int(log['run'].iloc[0]), log, tables)
+    summary = analysis.summary
+    fig_knock = wrx.make_annotated_heatmap(tables['total_timing'], "Total Timing Map (knock in red)", colorscale='Spectral_r',
+                                           used=analysis.timing.hits, knock=analysis.timing.knock)
+    fig_ve = wrx.make_annotated_heatmap(wrx.veTable(analysis.ve), "Volumetric Efficiency (VE %)", colorscale='Spectral_r')
+    fig_boost = wrx.plotBoost(log, tables['boost'], analysis.boost_target)
+
+    knock_html = fig_knock.to_html(full_html=False, include_plotlyjs=False)
+    ve_html = fig_ve.to_html(full_html=False, include_plotlyjs=False)
+    boost_html = fig_boost.to_html(full_html=False, include_plotlyjs=False)
+
+    return f"""
+        <div class="run">
+          <h2>Run {analysis.run} &middot; {datetime.now():%H:%M:%S}</h2>
+          <p class="{ 'knock' if summary['knock_samples'] else '' }">
+            {summary['samples']} samples, {summary['knock_samples']} knock samples, {len(analysis.knock_events.run)} knock events,
+            peak boost {summary['peak_boost']:.2f} psi, peak load {summary['peak_load']:.2f} g/rev
+          </p>
+          <div class="grid-timing">
+            <div class="map">{knock_html}</div>
+            <div class="map">{ve_html}</div>
+            <div class="map">{boost_html}</div>
+          </div>
+        </div>
+        """
+
+
+def renderLivePage(live, runs_html, refresh):
+    if live.splitter.open_parts:
+        status = f"WOT run {live.splitter.run} in progress ({live.splitter.openRows()} samples)"
+    else:
+        status = "Waiting for WOT"
+
+    return f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+      <meta charset="utf-8"/>
+      <title>WRX Live WOT Analysis</title>
+      <script charset="utf-8" src="{wrx.plotlyCdnUrl()}"></script>
+      <style>
+        body {{ font-family: Arial, sans-serif; margin: 12px; }}
+        .status {{ color: #555; }}
+        .knock {{ color: #b00020; font-weight: 600; }}
+        .grid-timing {{
+          display: grid;
+          grid-template-columns: 1fr 1fr;
+          gap: 12px;
+        }}
+        .map {{
+          width: 100%;
+          min-width: 300px;
+        }}
+      </style>
+    </head>
+    <body>
+      <h1>WRX Live WOT Analysis</h1>
+      <p class="status">{escape(live.log_file)}: {live.rows} samples read. {status}. Updated {datetime.now():%H:%M:%S}.</p>
+      {''.join(reversed(runs_html))}
+      <script>
+        const version = __VERSION__;
+        setInterval(() => {{
+          fetch('/version', {{cache: 'no-store'}})
+            .then(r => r.text())
+            .then(v => {{ if (Number(v) !== version) location.reload(); }})
+            .catch(() => {{}});
+        }}, {int(refresh * 1000)});
+      </script>
+    </body>
+    </html>
+    """
+
+
+def runLive(log_file, tables, host="127.0.0.1", port=8050, interval=0.5, refresh=2.0, keep=10):
+    live = LiveLog(log_file)
+    page = LivePage()
+    # Finished runs are rendered once and kept; the page only re-joins them
+    runs_html = deque(maxlen=keep)
+    page.update(renderLivePage(live, runs_html, refresh))
+    serve(page, host, port)
+    print(f"📡 Serving live analysis of {log_file} on http://{host}:{port}/ (Ctrl+C to stop)")
+
+    was_open = False
+    try:
+        while True:
+            if os.path.exists(log_file):
+                finished = live.poll()
+                for log in finished:
+                    runs_html.append(renderLiveRun(log, tables))
+                    print(f"✅ Run {int(log['run'].iloc[0])}: {len(log)} samples")
+                is_open = bool(live.splitter.open_parts)
+                if finished or is_open != was_open:
+                    page.update(renderLivePage(live, runs_html, refresh))
+                was_open = is_open
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Stopped live analysis.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a RomRaider log while it is still being written.")
+    parser.add_argument("log", help="CSV log RomRaider is writing")
+    parser.add_argument("--rom", default="C:/WRX/wrx_rom_tables.xlsx", help="ROM tables workbook")
+    parser.add_argument("--host", default="127.0.0.1", help="address to serve the live page on")
+    parser.add_argument("--port", type=int, default=8050, help="port to serve the live page on")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between reads of the log")
+    parser.add_argument("--keep", type=int, default=10, help="number of finished runs shown on the page")
+    args = parser.parse_args()
+    wrx.checkRom(parser, args.rom)
+
+    tables = wrx.loadTables(args.rom)
+    runLive(args.log, tables, host=args.host, port=args.port, interval=args.interval, keep=args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import main as wrx
+
+
+# Columnar copy of a RomRaider log: one .npy file per column under the
+# canonical short names from wrx.headers, a runs.npy sidecar with the WOT run
+# boundaries and a meta.json describing both. Reopening memory-maps the
+# columns, so nothing is parsed or copied until a run is actually sliced.
+STORE_DIR = os.path.join(wrx.CACHE_DIR, "logs")
+STORE_VERSION = 2
+
+
+def storePath(log_file, store_dir=STORE_DIR):
+    log_path = os.path.abspath(log_file)
+    return os.path.join(store_dir, hashlib.sha1(log_path.encode()).hexdigest())
+
+
+def sourceStamp(log_file):
+    stat = os.stat(log_file)
+    return {'path': os.path.abspath(log_file), 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+
+def ingestLog(log_file, store_dir=STORE_DIR):
+    path = storePath(log_file, store_dir)
+    stamp = sourceStamp(log_file)
+    df = wrx.readLog(log_file)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, (name, col) in enumerate(df.items()):
+        values = col.to_numpy()
+        if values.dtype == object:
+            values = values.astype(str)
+        file_name = f"{i:04d}.npy"
+        np.save(os.path.join(tmp_path, file_name), values, allow_pickle=False)
+        columns.append({'name': name, 'file': file_name, 'dtype': values.dtype.str})
+
+    starts, ends = wrx.wotRunBounds(df['Throttle'])
+    np.save(os.path.join(tmp_path, "runs.npy"), np.column_stack([starts, ends]).astype(np.int64))
+
+    meta = {'version': STORE_VERSION, 'source': stamp, 'rows': len(df), 'columns': columns}
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def readMeta(path):
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def isFresh(log_file, path):
+    meta = readMeta(path)
+    return bool(meta) and meta['version'] == STORE_VERSION and meta['source'] == sourceStamp(log_file)
+
+
+def openLog(path):
+    # Zero copy: every column is a read-only memmap over its .npy file
+    meta = readMeta(path)
+    data = {c['name']: np.load(os.path.join(path, c['file']), mmap_mode='r') for c in meta['columns']}
+    df = pd.DataFrame(data, copy=False)
+    runs = np.load(os.path.join(path, "runs.npy"))
+    return df, runs
+
+
+def loadLog(log_file, store_dir=STORE_DIR):
+    path = storePath(log_file, store_dir)
+    if not isFresh(log_file, path):
+        ingestLog(log_file, store_dir)
+    return openLog(path)
+
+
+def iterRuns(df, runs):
+    # Same frames getWOTruns returns, sliced straight from the mapped columns
+    for run, (start, end) in enumerate(runs, 1):
+        log = df.iloc[start:end].reset_index(drop=True)
+        log['run'] = np.int32(run)
+        yield log
+
+
+def loadLogRuns(log_file, store_dir=STORE_DIR):
+    return iterRuns(*loadLog(log_file, store_dir))
@@ -1,8 +1,35 @@
-import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
-from tkinter import filedialog as fd
-from tkinter import Tk
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import importlib
+import json
+import os
+import pickle
+from collections import Counter, deque
+from typing import NamedTuple
+
+import profiling
+from profiling import profiled
+
+
+class LazyModule:
+    # Stand-in for a heavy module that is only imported on first use, so
+    # `--help` and other cheap paths never pay for numpy/pandas/plotly
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+go = LazyModule("plotly.graph_objects")
 
 
 headers = {
@@ -31,156 +58,715 @@ headers = {
 }
 
 
+@profiled
 def formatTable(df):
     load_headers = list(round(df.iloc[0,], 2))
     rpm_headers = list(df.iloc[1:, 0])
     df = df.iloc[1:, 1:]
 
-    for i, col in enumerate(df.columns):
-        df = df.rename(columns={col: load_headers[i]})
-    for i, n in enumerate(rpm_headers):
-        df = df.rename(index={i+1: int(n)})
+    df = df.set_axis(load_headers[:df.shape[1]], axis=1)
+    df = df.set_axis([int(n) for n in rpm_headers], axis=0)
     return df
 
 
-def getWOTruns(df):
-
-    # df = df[df['Throttle Opening Angle (%)'] > 75]
-    for key in headers:
-        if key in df.columns:
-            df = df.rename(columns={key: headers[key]})
-
-    # Identify where consecutive 100s start a new group
-    df['run'] = (df['Throttle'].eq(100) & ~df['Throttle'].shift().eq(100)).cumsum()
-
-    # Only keep group numbers for rows that are 100; others = NaN
-    df.loc[~df['Throttle'].eq(100), 'run'] = None
-    filtered_df = df[df['run'].notna()].reset_index(drop=True)
-    filtered_df['run'] = filtered_df['run'].astype(int)
-
-    # Split into separate DataFrames
-    group_dfs = [g.reset_index(drop=True) for _, g in filtered_df.groupby('run')]
-
-    return group_dfs
+# Columns the analysis actually reads, by short name, with the narrowest dtype
+# that holds RomRaider's values exactly. Time stays float64 so multi-hour logs
+# keep millisecond resolution; the sensors fit float32.
+LOG_SCHEMA = {
+    "Time": "float64",
+    "RPM": "float32",
+    "g/rev": "float32",
+    "Throttle": "float32",
+    "FBKC": "float32",
+    "FLKC": "float32",
+    "Est AFR": "float32",
+    "WBO2": "float32",
+    "Timing": "float32",
+    "AVCS": "float32",
+    "MRP": "float32",
+    "IAT-F": "float32",
+    "IAT-C": "float32",
+}
 
 
+def logColumns(header):
+    # Short names for a log's header row plus the projection and dtypes to
+    # hand to read_csv, so nothing has to be renamed or converted afterwards
+    names = [headers.get(h, h) for h in header]
+    usecols = [n for n in names if n in LOG_SCHEMA]
+    return names, usecols, {n: LOG_SCHEMA[n] for n in usecols}
+
+
+def readLog(log_file, **kwargs):
+    with open(log_file, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f))
+    names, usecols, dtype = logColumns(header)
+    return pd.read_csv(log_file, header=0, names=names, usecols=usecols, dtype=dtype, **kwargs)
+
+
+@profiled
+def getWOTruns(df, min_throttle=100):
+    # Runs are row slices of the one frame rather than copies; the only new
+    # data is a run number column shared by all of them
+    if any(key in df.columns for key in headers):
+        df = df.rename(columns=headers)
+
+    starts, ends = wotRunBounds(df['Throttle'], min_throttle)
+    run = np.zeros(len(df), dtype=np.int32)
+    for i, (start, end) in enumerate(zip(starts, ends), 1):
+        run[start:end] = i
+    df = df.assign(run=run)
+
+    return [df.iloc[start:end] for start, end in zip(starts, ends)]
+
+
+def wotRunBounds(throttle, min_throttle=100):
+    # [start, end) row ranges of every run with Throttle at or above
+    # min_throttle; the default keeps only wide open (100%) throttle
+    wot = np.asarray(throttle, dtype=float) >= min_throttle
+    edges = np.diff(np.r_[0, wot.astype(np.int8), 0])
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+class WOTRunSplitter:
+    # Incremental getWOTruns: feed() takes consecutive chunks of a log and
+    # returns the Throttle==100 runs that closed inside them. A run still open
+    # at the end of a chunk is carried over, so only the run in progress is
+    # held in memory.
+    def __init__(self):
+        self.open_parts = []
+        self.run = 0
+
+    def closeRun(self, parts):
+        log = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+        log['run'] = np.int32(self.run)
+        return log
+
+    def feed(self, chunk):
+        finished = []
+        wot = chunk['Throttle'].eq(100).to_numpy()
+        prev = np.r_[bool(self.open_parts), wot[:-1]]
+        starts = np.flatnonzero(wot & ~prev)
+        ends = np.flatnonzero(~wot & prev)
+
+        if self.open_parts:
+            if len(ends) == 0:
+                self.open_parts.append(chunk)
+                return finished
+            self.open_parts.append(chunk.iloc[:ends[0]])
+            finished.append(self.closeRun(self.open_parts))
+            self.open_parts = []
+            ends = ends[1:]
+
+        for j, start in enumerate(starts):
+            self.run += 1
+            if j < len(ends):
+                finished.append(self.closeRun([chunk.iloc[start:ends[j]]]))
+            else:
+                self.open_parts = [chunk.iloc[start:]]
+        return finished
+
+    def openRows(self):
+        return sum(len(part) for part in self.open_parts)
+
+    def flush(self):
+        finished = [self.closeRun(self.open_parts)] if self.open_parts else []
+        self.open_parts = []
+        return finished
+
+
+def iterWOTruns(log_file, chunksize=100_000):
+    # Streaming version of getWOTruns: yields each run as soon as it closes
+    splitter = WOTRunSplitter()
+    for chunk in readLog(log_file, chunksize=chunksize):
+        yield from splitter.feed(chunk)
+    yield from splitter.flush()
+
+
+class CellHits(NamedTuple):
+    rows: np.ndarray     # table row (RPM) index for every sample
+    cols: np.ndarray     # table column (g/rev) index for every sample
+    knocked: np.ndarray  # True for samples with FBKC or FLKC pulled
+    binned: np.ndarray   # False where RPM or g/rev is blank; those samples are in no cell
+    hits: np.ndarray     # samples per cell, same shape as the table
+    knock: np.ndarray    # knock samples per cell, same shape as the table
+
+
+def axisIndex(axis, values):
+    # Nearest breakpoint on a ROM axis for every value in one searchsorted pass.
+    # Ties go to the lower breakpoint and values past either end clamp to the
+    # edge cell. NaN comes back as the last breakpoint, so callers mask blank
+    # values out (see CellHits.binned).
+    axis = np.asarray(axis, dtype=float)
+    # values are rounded like the edges so float32 logs bin like float64 ones
+    values = np.round(np.asarray(values, dtype=float), 6)
+    order = np.argsort(axis, kind='stable')
+    ordered = axis[order]
+    # rounded so a value sitting exactly on a midpoint (1.3 between 1.2 and
+    # 1.4) doesn't fall either way on float noise
+    edges = np.round((ordered[1:] + ordered[:-1]) / 2, 6)
+    return order[np.searchsorted(edges, values, side='left')]
+
+
+def knockMask(log):
+    knocked = np.zeros(len(log), dtype=bool)
+    for col in ('FBKC', 'FLKC'):
+        if col in log.columns:
+            knocked |= log[col].to_numpy(dtype=float) < 0
+    return knocked
+
+
+@profiled(rows_arg=1)
+def binCells(table, log):
+    rpm, load = logValues(log, 'RPM'), logValues(log, 'g/rev')
+    rows = axisIndex(table.index, rpm)
+    cols = axisIndex(table.columns, load)
+    knocked = knockMask(log)
+    binned = np.isfinite(rpm) & np.isfinite(load)
+
+    flat = rows * table.shape[1] + cols
+    hits = np.bincount(flat[binned], minlength=table.size).reshape(table.shape)
+    knock = np.bincount(flat[knocked & binned], minlength=table.size).reshape(table.shape)
+    return CellHits(rows, cols, knocked, binned, hits, knock)
+
+
+def cellLabels(table, cells, mask=None):
+    mask = cells.binned if mask is None else mask & cells.binned
+    rows, cols = cells.rows[mask], cells.cols[mask]
+    return table.columns[cols].tolist(), table.index[rows].tolist()
+
+
+@profiled(rows_arg=1)
 def getWOTparams(df, log):
-    r, g = [], []
-    logged_gs = log['g/rev'].tolist()
-    logged_rpm = log['RPM'].tolist()
-
-    for grev in logged_gs:
-        for g_rev in df.columns.tolist():
-            if g_rev - .1 < grev <= g_rev + .1:
-                g.append(g_rev)
-                break
-    for rpm in logged_rpm:
-        for r_pm in df.index:
-            if r_pm - 200 < rpm <= r_pm + 200:
-                r.append(r_pm)
-                break
-    return g, r
+    return cellLabels(df, binCells(df, log))
 
 
+@profiled(rows_arg=1)
 def getKnocking(df, log):
-    g, r = [], []
-    logged_FBKC = log.loc[log['FBKC'] < 0]
-    logged_FLKC = log.loc[log['FLKC'] < 0]
-    if len(logged_FBKC.index) == 0 and len(logged_FLKC.index) == 0:
-        return g, r
-    logged_knock = pd.concat([logged_FBKC, logged_FLKC])
-    for grev in logged_knock['g/rev'].tolist():
-        for g_rev in df.columns.tolist():
-            if g_rev - .1 < grev <= g_rev + .1:
-                g.append(g_rev)
-                break
-    for rpm in logged_knock['RPM'].tolist():
-        for r_pm in df.index:
-            if r_pm - 200 < rpm <= r_pm + 200:
-                r.append(r_pm)
-                break
-    return g, r
+    cells = binCells(df, log)
+    return cellLabels(df, cells, cells.knocked)
 
 
+@profiled(rows_arg=1)
 def getAVCS(avcs, log):
-    r, g = [], []
-    logged_gs = log['g/rev'].tolist()
-    logged_rpm = log['RPM'].tolist()
-    for grev in logged_gs:
-        for g_rev in avcs.columns.tolist():
-            if g_rev - .1 < grev <= g_rev + .1:
-                g.append(g_rev)
-                break
-    for rpm in logged_rpm:
-        for r_pm in avcs.index:
-            if r_pm - 200 < rpm <= r_pm + 200:
-                r.append(r_pm)
-                break
-    return g, r
+    return cellLabels(avcs, binCells(avcs, log))
+
 
+def iatCelsius(log):
+    # RomRaider logs IAT in whichever unit the logger profile uses
+    if 'IAT-F' in log.columns:
+        return (log['IAT-F'].to_numpy(dtype=float) - 32) * 5/9
+    return logValues(log, 'IAT-C')
 
-def getVE(df):
-    VE = []
+
+def calcVE(df):
     ATM_KPA = 92
     DISP = 128.15
-    logged_RPM = df['RPM'].tolist()
-    logged_gs = df['g/rev'].tolist()
-    logged_MRP = df['MRP'].tolist()
+    RPM = df['RPM'].to_numpy(dtype=float)
+    MAF = df['g/rev'].to_numpy(dtype=float) * RPM / 60
+    AMP = df['MRP'].to_numpy(dtype=float) * 6.89476 + ATM_KPA
 
-    try:
-        logged_IAT = df['IAT-F'].tolist()
-        logged_IAT = [(x - 32) * 5/9 for x in logged_IAT]
-    except KeyError:
-        logged_IAT = df['IAT-C'].tolist()
-
-    for RPM, MAF, AMP, IAT in zip(logged_RPM, logged_gs, logged_MRP, logged_IAT):
-        AMP = (AMP * 6.89476) + ATM_KPA
-        MAF = MAF * RPM / 60
+    IAT = iatCelsius(df)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
         calc_VE = (MAF / ((AMP * 1000) / (287.05 * (IAT + 273.15)) * 1000)) / (DISP * RPM / 3456 * 0.0283 / 60)
-        VE.append(round(calc_VE * 100, 3))
-    df_VE = pd.DataFrame({'1': VE}, index=logged_RPM)
+    return np.round(calc_VE * 100, 3)
+
+
+class VEGrid(NamedTuple):
+    # Per-cell statistics of one value (VE, or a CellStats channel) on a ROM
+    # table's RPM x g/rev axes. Sums and counts rather than means so grids
+    # from different runs/logs merge exactly.
+    index: pd.Index
+    columns: pd.Index
+    count: np.ndarray
+    sum: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+
+
+def cellGrid(table, cells, values):
+    # NaN/inf samples (blank log fields, VE at 0 rpm) are left out of the cell
+    values = np.asarray(values, dtype=float)
+    ok = np.isfinite(values) & cells.binned
+    flat = (cells.rows * table.shape[1] + cells.cols)[ok]
+    values = values[ok]
+
+    count = np.bincount(flat, minlength=table.size)
+    total = np.bincount(flat, weights=values, minlength=table.size)
+    low = np.full(table.size, np.inf)
+    high = np.full(table.size, -np.inf)
+    np.minimum.at(low, flat, values)
+    np.maximum.at(high, flat, values)
+
+    shape = table.shape
+    return VEGrid(table.index, table.columns, count.reshape(shape), total.reshape(shape), low.reshape(shape), high.reshape(shape))
+
+
+@profiled
+def getVE(df, table, cells=None):
+    # cells: binCells(table, df) when the caller already has it
+    return cellGrid(table, binCells(table, df) if cells is None else cells, calcVE(df))
+
+
+def mergeVE(grids):
+    grids = list(grids)
+    first = grids[0]
+    return first._replace(
+        count=sum(g.count for g in grids),
+        sum=sum(g.sum for g in grids),
+        min=np.minimum.reduce([g.min for g in grids]),
+        max=np.maximum.reduce([g.max for g in grids]),
+    )
+
+
+def veTable(grid, stat='mean'):
+    # Cells without samples come back as NaN
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = {
+            'mean': grid.sum / grid.count,
+            'min': grid.min,
+            'max': grid.max,
+            'count': grid.count.astype(float),
+        }[stat]
+    values = np.where(grid.count > 0, values, np.nan)
+    return pd.DataFrame(values, index=grid.index, columns=grid.columns)
+
+
+def logValues(log, col):
+    if col not in log.columns:
+        return np.full(len(log), np.nan)
+    return log[col].to_numpy(dtype=float)
+
+
+# Per-sample values accumulated per cell by getCellStats, each kept as a VEGrid
+CELL_CHANNELS = {
+    'FBKC': lambda log: logValues(log, 'FBKC'),
+    'FLKC': lambda log: logValues(log, 'FLKC'),
+    'AFR error': lambda log: logValues(log, 'WBO2') - logValues(log, 'Est AFR'),
+    'Timing': lambda log: logValues(log, 'Timing'),
+}
+
+
+class CellStats(NamedTuple):
+    # Aggregates over any number of runs on a ROM table's axes. Every field is
+    # a count, sum, min or max, so mergeCellStats is exact and associative and
+    # stats can be built per run in workers and combined in any grouping.
+    index: pd.Index
+    columns: pd.Index
+    count: np.ndarray    # samples per cell
+    knock: np.ndarray    # samples with FBKC or FLKC pulled
+    events: np.ndarray   # knock events, counted in the cell where each began
+    channels: dict       # CELL_CHANNELS name -> VEGrid
+
+
+@profiled
+def getCellStats(log, table, cells=None):
+    if cells is None:
+        cells = binCells(table, log)
+    # A knock event starts on a knocked sample whose predecessor wasn't
+    onset = cells.knocked & ~np.r_[False, cells.knocked[:-1]]
+    flat = cells.rows * table.shape[1] + cells.cols
+    events = np.bincount(flat[onset & cells.binned], minlength=table.size).reshape(table.shape)
+    channels = {name: cellGrid(table, cells, values(log)) for name, values in CELL_CHANNELS.items()}
+    return CellStats(table.index, table.columns, cells.hits, cells.knock, events, channels)
+
+
+def mergeCellStats(stats):
+    stats = list(stats)
+    first = stats[0]
+    return first._replace(
+        count=sum(s.count for s in stats),
+        knock=sum(s.knock for s in stats),
+        events=sum(s.events for s in stats),
+        channels={name: mergeVE(s.channels[name] for s in stats) for name in first.channels},
+    )
+
+
+def cellStatsTable(stats, name, stat='mean'):
+    # name is 'count', 'knock', 'events' or a CELL_CHANNELS channel, whose
+    # stat is picked as in veTable; cells without samples are NaN
+    if name in ('count', 'knock', 'events'):
+        values = np.where(stats.count > 0, getattr(stats, name), np.nan)
+        return pd.DataFrame(values, index=stats.index, columns=stats.columns)
+    return veTable(stats.channels[name], stat)
+
+
+def saveCellStats(stats_file, stats):
+    # Plain .npz (no pickle) so the file can be shared and merged later
+    arrays = {'index': stats.index.to_numpy(), 'columns': stats.columns.to_numpy(),
+              'count': stats.count, 'knock': stats.knock, 'events': stats.events}
+    for name, grid in stats.channels.items():
+        for field in ('count', 'sum', 'min', 'max'):
+            arrays[f'{name}/{field}'] = getattr(grid, field)
+    tmp_file = f"{stats_file}.tmp.npz"
+    np.savez_compressed(tmp_file, **arrays)
+    os.replace(tmp_file, stats_file)
+
+
+def loadCellStats(stats_file):
+    with np.load(stats_file, allow_pickle=False) as data:
+        index, columns = pd.Index(data['index']), pd.Index(data['columns'])
+        channels = {
+            name: VEGrid(index, columns, *(data[f'{name}/{field}'] for field in ('count', 'sum', 'min', 'max')))
+            for name in dict.fromkeys(key.split('/')[0] for key in data.files if '/' in key)
+        }
+        return CellStats(index, columns, data['count'], data['knock'], data['events'], channels)
+
+
+class KnockEvents(NamedTuple):
+    # Knock episodes as columns, one value per event in every field, so the
+    # events of any number of runs concatenate into one compact index
+    # (mergeKnockEvents) and are filtered with plain boolean masks.
+    run: np.ndarray       # run number within the log
+    start_ms: np.ndarray  # first knocked sample
+    end_ms: np.ndarray    # last knocked sample
+    samples: np.ndarray   # knocked samples in the event
+    fbkc: np.ndarray      # most negative FBKC during the event
+    flkc: np.ndarray      # most negative FLKC during the event
+    rpm: np.ndarray       # the rest are taken at the event's first sample
+    load: np.ndarray
+    timing: np.ndarray
+    afr: np.ndarray       # wideband
+    iat: np.ndarray       # degrees C
+
+
+# KnockEvents fields read at onset, and the log values they come from
+KNOCK_ONSET = {
+    'rpm': lambda log: logValues(log, 'RPM'),
+    'load': lambda log: logValues(log, 'g/rev'),
+    'timing': lambda log: logValues(log, 'Timing'),
+    'afr': lambda log: logValues(log, 'WBO2'),
+    'iat': iatCelsius,
+}
+
+
+def noKnockEvents():
+    # Empty, but with the dtypes getKnockEvents gives every field
+    dtypes = {'run': np.int32, 'start_ms': np.float64, 'end_ms': np.float64, 'samples': np.int32}
+    return KnockEvents(*(np.empty(0, dtype=dtypes.get(name, np.float32)) for name in KnockEvents._fields))
+
+
+@profiled
+def getKnockEvents(log, run=None, knocked=None, gap_ms=0.0):
+    # A knock event is a stretch of consecutive samples with FBKC or FLKC
+    # pulled. gap_ms clusters events whose knocked samples are at most that
+    # far apart into one. All reductions run over the knocked samples only,
+    # so the work follows the amount of knock rather than the log length.
+    if knocked is None:
+        knocked = knockMask(log)
+    idx = np.flatnonzero(knocked)
+    if not len(idx):
+        # Most runs don't knock; skip reading any column for them
+        return noKnockEvents()
+    if run is None:
+        run = int(log['run'].iloc[0]) if 'run' in log.columns else 0
+    time = logValues(log, 'Time')[idx]
+
+    # A knocked sample opens an event unless it follows another one directly
+    # or within gap_ms
+    opens = np.ones(len(idx), dtype=bool)
+    opens[1:] = (np.diff(idx) > 1) & ~(np.diff(time) <= gap_ms)
+    starts = np.flatnonzero(opens)
+    bounds = np.r_[starts, len(idx)]
+    onset = idx[starts]
+
+    def peak(col):
+        # fmin skips samples where only one of FBKC/FLKC is logged
+        return np.fmin.reduceat(logValues(log, col)[idx], starts).astype(np.float32)
+
+    return KnockEvents(
+        run=np.full(len(starts), run, dtype=np.int32),
+        start_ms=time[starts],
+        end_ms=time[bounds[1:] - 1],
+        samples=np.diff(bounds).astype(np.int32),
+        fbkc=peak('FBKC'),
+        flkc=peak('FLKC'),
+        **{name: values(log)[onset].astype(np.float32) for name, values in KNOCK_ONSET.items()},
+    )
+
+
+def mergeKnockEvents(events):
+    return KnockEvents(*(np.concatenate(field) for field in zip(*events)))
+
+
+def knockEventsFrame(events):
+    # One row per event, for filtering and sorting with pandas
+    return pd.DataFrame(events._asdict())
+
+
+def jsonKnockEvents(events):
+    # Columns as lists, rounded so float32 noise stays out of the export
+    return {name: np.round(values.astype(float), 4).tolist() if values.dtype.kind == 'f' else values.tolist()
+            for name, values in events._asdict().items()}
+
+
+class TableGrid(NamedTuple):
+    # A ROM table as sorted float axes plus its values, ready for interpTable
+    rows: np.ndarray     # RPM breakpoints
+    cols: np.ndarray     # column axis breakpoints (g/rev, or throttle for boost)
+    values: np.ndarray
+
+
+def tableGrid(table):
+    rows = np.asarray(table.index, dtype=float)
+    cols = np.asarray(table.columns, dtype=float)
+    values = table.to_numpy(dtype=float)
+    row_order, col_order = np.argsort(rows, kind='stable'), np.argsort(cols, kind='stable')
+    rows, cols, values = rows[row_order], cols[col_order], values[np.ix_(row_order, col_order)]
+    # A one-breakpoint axis is widened to two identical cells so every table
+    # interpolates the same way
+    if len(rows) == 1:
+        rows, values = np.r_[rows, rows + 1], np.vstack([values, values])
+    if len(cols) == 1:
+        cols, values = np.r_[cols, cols + 1], np.hstack([values, values])
+    return TableGrid(rows, cols, values)
+
+
+def axisWeights(axis, values):
+    # Lower breakpoint and the fractional distance to the next one for every
+    # value, clamped to the table edges like the ECU does
+    i = np.clip(np.searchsorted(axis, values, side='right') - 1, 0, len(axis) - 2)
+    with np.errstate(invalid='ignore'):
+        t = np.clip((values - axis[i]) / (axis[i + 1] - axis[i]), 0, 1)
+    return i, t
+
+
+def interpTable(grid, rpm, x):
+    # Bilinear lookup of the table at every (rpm, x) sample in one pass
+    rpm = np.asarray(rpm, dtype=float)
+    x = np.asarray(x, dtype=float)
+    i, t = axisWeights(grid.rows, rpm)
+    j, u = axisWeights(grid.cols, x)
+    v = grid.values
+    return ((v[i, j] * (1 - u) + v[i, j + 1] * u) * (1 - t)
+            + (v[i + 1, j] * (1 - u) + v[i + 1, j + 1] * u) * t)
+
+
+# name -> (table, column axis channel, logged actual)
+TARGETS = {
+    'Timing': ('total_timing', 'g/rev', 'Timing'),
+    'AFR': ('ol_fueling', 'g/rev', 'WBO2'),
+    'Boost': ('boost', 'Throttle', 'MRP'),
+    'AVCS': ('avcs', 'g/rev', 'AVCS'),
+}
+
+
+def tableGrids(tables):
+    return {name: tableGrid(tables[key]) for name, (key, _, _) in TARGETS.items() if key in tables}
+
+
+@profiled(rows_arg=0)
+def getTargets(log, tables):
+    # What each table commanded at every sample and how far the logged value
+    # was from it (actual - target), as '<name> Target' / '<name> Error'
+    grids = tables.get('grids') or tableGrids(tables)
+    rpm = logValues(log, 'RPM')
+    columns = {}
+    for name, (_, axis, actual) in TARGETS.items():
+        if name not in grids:
+            continue
+        target = interpTable(grids[name], rpm, logValues(log, axis))
+        columns[f'{name} Target'] = target.astype(np.float32)
+        columns[f'{name} Error'] = (logValues(log, actual) - target).astype(np.float32)
+    return pd.DataFrame(columns, index=log.index)
+
 
-    return df_VE
+def resampleRun(log, columns, period_ms=10.0):
+    # The run's channels on a uniform time grid, linearly interpolated between
+    # RomRaider's jittery ~48 ms samples
+    t = log['Time'].to_numpy(dtype=float)
+    grid = np.arange(t[0], t[-1] + period_ms / 2, period_ms)
+    return pd.DataFrame({'Time': grid, **{c: np.interp(grid, t, log[c].to_numpy(dtype=float)) for c in columns}})
 
 
+# Channels with a transport delay -> the ECU channel they are aligned against
+LAG_CHANNELS = {
+    'WBO2': 'Est AFR',
+}
+
+
+# An estimate is applied only when the estimates from alternate runs agree to
+# within MAX_LAG_SPREAD_MS and the channels' changes correlate at all at the
+# lag (sensor noise keeps r low even for a clear delay, so agreement is the
+# real test); otherwise it is reported but not applied
+MIN_LAG_R = 0.1
+MAX_LAG_SPREAD_MS = 60.0
+
+# Both channels are smoothed over this window before they are differenced, so
+# sensor noise doesn't swamp the changes being matched
+LAG_SMOOTH_MS = 100.0
+
+
+class LagEstimate(NamedTuple):
+    lag_ms: float     # positive when the channel trails its reference
+    r: float          # correlation of the two channels' changes at that lag
+    spread_ms: float  # |lag from odd runs - lag from even runs|, NaN for one run
+    samples: int      # resampled samples the estimate is based on
+
+
+def lagApplies(lag):
+    return lag.r >= MIN_LAG_R and lag.spread_ms <= MAX_LAG_SPREAD_MS
+
+
+def lagCurve(ref, values, ref_mask, mask, k):
+    # Sums over the overlapping samples at every lag 0..k, each from one FFT
+    # product: sum ref*values, overlap count, and both channels' energy. A
+    # sensor can only trail the ECU, so negative lags aren't searched.
+    nfft = 1 << int(2 * len(ref) - 1).bit_length()
+    ref_f, values_f, ref_mask_f, mask_f = (np.fft.rfft(x, nfft) for x in (ref, values, ref_mask, mask))
+
+    def xcorr(a_f, b_f):
+        # c[j] = sum a[n] * b[n + j], so a peak sits at the delay
+        return np.fft.irfft(np.conj(a_f) * b_f, nfft)[:k + 1]
+
+    return np.array([xcorr(ref_f, values_f), xcorr(ref_mask_f, mask_f),
+                     xcorr(np.fft.rfft(ref * ref, nfft), mask_f), xcorr(ref_mask_f, np.fft.rfft(values * values, nfft))])
+
+
+def lagPeak(curve, period_ms):
+    # Lag of the normalized correlation's peak, parabola-refined, and its r
+    c, overlap, ref_energy, energy = curve
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = np.where(overlap > 0, c / np.sqrt(ref_energy * energy), np.nan)
+    if not np.isfinite(r).any():
+        return np.nan, 0.0
+    best = int(np.nanargmax(r))
+    shift = 0.0
+    if 0 < best < len(r) - 1 and np.isfinite(r[best - 1:best + 2]).all():
+        left, mid, right = r[best - 1:best + 2]
+        denom = left - 2 * mid + right
+        if denom < 0:
+            shift = 0.5 * (left - right) / denom
+    return float((best + shift) * period_ms), float(r[best])
+
+
+def estimateLags(runs, period_ms=10.0, max_lag_ms=1000.0, channels=LAG_CHANNELS):
+    # Cross-correlation of each channel with its reference over every run at
+    # once. The runs are resampled, smoothed and differenced, then laid end to
+    # end with a max_lag_ms gap of zeros between them, so one FFT correlates
+    # them all without one run's tail sliding into the next. Differencing
+    # leaves the changes (throttle tip-in, the fuel ramp) rather than the
+    # levels, whose broad, always-high correlation hid the delay. r at each
+    # lag is normalized by the energy of the samples that actually pair up,
+    # so no lag is favored for having more overlap. Odd and even runs are
+    # also summed separately and their peaks compared for the spread.
+    k = int(np.ceil(max_lag_ms / period_ms))
+    gap = np.zeros(k + 1)
+    width = max(int(round(LAG_SMOOTH_MS / period_ms)), 1)
+    kernel = np.ones(width) / width
+    series = {name: ([], []) for name in channels}
+    for log in runs:
+        if len(log) < 3:
+            continue
+        present = [name for name, ref in channels.items() if name in log.columns and ref in log.columns]
+        if not present:
+            continue
+        grid = resampleRun(log, set(present) | {channels[name] for name in present}, period_ms)
+        if len(grid) < width + 2:
+            continue
+        for name in present:
+            ref, values = (np.diff(np.convolve(grid[col].to_numpy(), kernel, 'valid')) for col in (channels[name], name))
+            ref_mask = np.isfinite(ref)
+            # The channel's first k samples are left out, so every lag is
+            # scored on the same samples and a change that only the lagging
+            # channel caught inside the run (the tip-in, already past in
+            # the reference) is never among them
+            mask = np.isfinite(values)
+            mask[:k] = False
+            parts = (np.where(ref_mask, ref, 0.0), np.where(mask, values, 0.0), ref_mask.astype(float), mask.astype(float))
+            halves = series[name]
+            halves[len(halves[0]) > len(halves[1])].append(parts)
+
+    lags = {}
+    for name, halves in series.items():
+        curves = []
+        for runs_parts in halves:
+            if runs_parts:
+                curves.append(lagCurve(*(np.concatenate([p for parts in runs_parts for p in (parts[i], gap)]) for i in range(4)), k))
+        if not curves:
+            continue
+        lag_ms, r = lagPeak(sum(curves), period_ms)
+        spread = abs(lagPeak(curves[0], period_ms)[0] - lagPeak(curves[1], period_ms)[0]) if len(curves) == 2 else np.nan
+        samples = sum(len(parts[0]) for runs_parts in halves for parts in runs_parts)
+        lags[name] = LagEstimate(lag_ms, r, float(spread), samples)
+    return lags
+
+
+def alignRun(log, lags):
+    # Pulls each lagging channel forward by its delay on the run's own time
+    # axis; the last lag_ms of the run have nothing to pull from and go NaN
+    t = log['Time'].to_numpy(dtype=float)
+    shifted = {}
+    for name, lag in lags.items():
+        lag_ms = lag.lag_ms if isinstance(lag, LagEstimate) else float(lag)
+        if name in log.columns and lag_ms:
+            shifted[name] = np.interp(t + lag_ms, t, log[name].to_numpy(dtype=float), left=np.nan, right=np.nan).astype(log[name].dtype)
+    return log.assign(**shifted) if shifted else log
+
+
+def cellCounts(df, cells):
+    # Highlights come either as a table-shaped count array (CellHits.hits /
+    # .knock) or as (rpm, g/rev) label pairs, which are deduplicated here
+    if isinstance(cells, np.ndarray) and cells.shape == df.shape:
+        return cells
+    row_pos = {r: i for i, r in enumerate(df.index)}
+    col_pos = {g: i for i, g in enumerate(df.columns)}
+    counts = np.zeros(df.shape, dtype=int)
+    for (r, g), n in Counter(cells).items():
+        if r in row_pos and g in col_pos:
+            counts[row_pos[r], col_pos[g]] += n
+    return counts
+
+
+def cellOverlay(counts, name, color, width):
+    # Every highlighted cell is a closed square in a single lines trace, broken
+    # apart by NaN gaps, so the cost is bounded by the table size
+    y, x = np.nonzero(counts)
+    n = np.repeat(counts[y, x], 6)
+    square_x = np.array([-0.5, 0.5, 0.5, -0.5, -0.5, np.nan])
+    square_y = np.array([-0.5, -0.5, 0.5, 0.5, -0.5, np.nan])
+    return go.Scatter(
+        x=(x[:, None] + square_x).ravel(),
+        y=(y[:, None] + square_y).ravel(),
+        mode='lines',
+        name=name,
+        line=dict(color=color, width=width),
+        text=[f"Samples: {c}" for c in n],
+        hovertemplate="%{text}<extra>" + name + "</extra>",
+        showlegend=False,
+    )
+
+
+@profiled
 def make_annotated_heatmap(df, title, colorscale='Spectral', xaxis_title='Load (g/rev)', not_rev=False, used=None, knock=None):
     text = np.round(df.values, 2).astype(str)
+    text[pd.isna(df.values)] = ''
+    rows = df.index.astype(str)
+    cols = df.columns.astype(str)
+
+    # Cells sit at integer positions with the axis labels as tick text, so the
+    # highlight overlays can be drawn in the same coordinates
     fig = go.Figure(data=go.Heatmap(
         z=df.values,
-        x=df.columns.astype(str),
-        y=df.index.astype(str),
+        x=np.arange(len(cols)),
+        y=np.arange(len(rows)),
         text=text,
         texttemplate="%{text}",
+        customdata=np.dstack(np.meshgrid(cols, rows)),
+        hovertemplate="RPM %{customdata[1]}<br>" + xaxis_title + " %{customdata[0]}<br>%{z}<extra></extra>",
         colorscale=colorscale,
         showscale=False
     ))
+    fig.update_xaxes(tickmode='array', tickvals=np.arange(len(cols)), ticktext=cols)
+    fig.update_yaxes(tickmode='array', tickvals=np.arange(len(rows)), ticktext=rows)
 
     # Highlight used (black) and knock (red) cells
-    if used:
-        for r, g in used:
-            if (r in df.index) and (g in df.columns):
-                y_i = list(df.index.astype(str)).index(str(r))
-                x_i = list(df.columns.astype(str)).index(str(g))
-                fig.add_shape(
-                    type="rect",
-                    x0=x_i - 0.5, x1=x_i + 0.5,
-                    y0=y_i - 0.5, y1=y_i + 0.5,
-                    line=dict(color="black", width=2),
-                    fillcolor="rgba(0,0,0,0)"
-                )
-
-    if knock:
-        for r, g in knock:
-            if (r in df.index) and (g in df.columns):
-                y_i = list(df.index.astype(str)).index(str(r))
-                x_i = list(df.columns.astype(str)).index(str(g))
-                fig.add_shape(
-                    type="rect",
-                    x0=x_i - 0.5, x1=x_i + 0.5,
-                    y0=y_i - 0.5, y1=y_i + 0.5,
-                    line=dict(color="red", width=3),
-                    fillcolor="rgba(0,0,0,0)"
-                )
+    if used is not None and len(used):
+        fig.add_trace(cellOverlay(cellCounts(df, used), "Used", "black", 2))
+
+    if knock is not None and len(knock):
+        fig.add_trace(cellOverlay(cellCounts(df, knock), "Knock", "red", 3))
 
     if not_rev:
         fig.update_layout(
@@ -204,22 +790,83 @@ def make_annotated_heatmap(df, title, colorscale='Spectral', xaxis_title='Load (
     return fig
 
 
-def plotBoost(log, boost_table):
-    # boost_rpm = [2600,2800,3600,4000,4400,6000,6800]
+def lttbIndices(y, budget, keep=None):
+    # Largest-triangle-three-buckets over sample order: the first and last
+    # samples plus, from each of budget-2 buckets, the one forming the largest
+    # triangle with the previous pick and the next bucket's average. Indices
+    # in keep (peaks, knock) are always added on top of the budget.
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if budget is None or n <= max(budget, 3):
+        return None
+    budget = max(budget, 3)
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, budget - 1).astype(int)
+    # NaN samples never win a bucket
+    y_fill = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+
+    picked = np.empty(budget, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for b in range(budget - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            next_x, next_y = x[hi:edges[b + 2]].mean(), y_fill[hi:edges[b + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y_fill[-1]
+        area = np.abs((x[a] - next_x) * (y_fill[lo:hi] - y_fill[a]) - (x[a] - x[lo:hi]) * (next_y - y_fill[a]))
+        a = lo + int(np.argmax(area))
+        picked[b + 1] = a
+
+    if keep is not None and len(keep):
+        picked = np.union1d(picked, keep)
+    return np.unique(picked)
+
+
+def plotKeep(log, peak_col):
+    # Samples decimation must never drop: the peak marker and every knock sample
+    peak = int(np.nanargmax(log[peak_col].to_numpy(dtype=float)))
+    return np.union1d([peak], np.flatnonzero(knockMask(log)))
+
+
+def decimated(values, idx):
+    if idx is None:
+        return values
+    if isinstance(values, list):
+        return [values[i] for i in idx]
+    return values.iloc[idx]
+
+
+@profiled
+def plotBoost(log, boost_table, target=None, max_points=None):
+    # The target is the boost table at each sample's RPM and throttle, so it
+    # lines up with the logged boost point for point. max_points decimates
+    # each trace to about that many samples (see lttbIndices).
     boost = log['MRP'].tolist()
     AFR = log['WBO2'].tolist()
     est_AFR = log['Est AFR'].tolist()
     RPM = log['RPM'].tolist()
-    tgt_boost = boost_table[100.00].tolist()
+    if target is None:
+        target = interpTable(tableGrid(boost_table), log['RPM'], log['Throttle'])
+    tgt_boost = np.asarray(target, dtype=float).tolist()
     peak_boost = max(boost)
     peak_rpm = RPM[boost.index(peak_boost)]
 
+    keep = plotKeep(log, 'MRP') if max_points else None
+    def trace(values):
+        idx = lttbIndices(values, max_points, keep)
+        return decimated(RPM, idx), decimated(values, idx)
+
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=RPM, y=boost, mode='lines', name='Boost (psi)', line=dict(color='green')))
-    fig.add_trace(go.Scatter(x=RPM, y=tgt_boost, mode='lines', name='Target Boost', line=dict(dash='dash', color='darkgreen')))
-    fig.add_trace(go.Scatter(x=[peak_rpm], y=[peak_boost], mode='markers+text', text=[f'{peak_boost} psi'], textposition='top center', name='Peak Boost', marker=dict(color='red', size=10)))
-    fig.add_trace(go.Scatter(x=RPM, y=AFR, mode='lines', name='Wideband AFR', yaxis='y2', line=dict(color='blue')))
-    fig.add_trace(go.Scatter(x=RPM, y=est_AFR, mode='lines', name='Estimated AFR', yaxis='y2', line=dict(dash='dash', color='navy')))
+    x, y = trace(boost)
+    fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name='Boost (psi)', line=dict(color='green')))
+    x, y = trace(tgt_boost)
+    fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name='Target Boost', line=dict(dash='dash', color='darkgreen')))
+    fig.add_trace(go.Scatter(x=[peak_rpm], y=[peak_boost], mode='markers+text', text=[f'{peak_boost:.2f} psi'], textposition='top center', name='Peak Boost', marker=dict(color='red', size=10)))
+    x, y = trace(AFR)
+    fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name='Wideband AFR', yaxis='y2', line=dict(color='blue')))
+    x, y = trace(est_AFR)
+    fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name='Estimated AFR', yaxis='y2', line=dict(dash='dash', color='navy')))
     fig.add_vline(x=peak_rpm)
     fig.update_layout(
         title="Boost & AFR vs RPM",
@@ -230,20 +877,24 @@ def plotBoost(log, boost_table):
 
     return fig
 
-def plotLoadvsRPM(log):
+@profiled
+def plotLoadvsRPM(log, max_points=None):
     fig = go.Figure()
     peak_load = max(log['g/rev'])
     peak_rpm = log['RPM'].tolist()[log['g/rev'].tolist().index(peak_load)]
+    keep = plotKeep(log, 'g/rev') if max_points else None
+    load_idx = lttbIndices(log['g/rev'], max_points, keep)
+    avcs_idx = lttbIndices(log['AVCS'], max_points, keep)
     fig.add_trace(go.Scatter(line=dict(color='blue'),
-        x=log['RPM'],
-        y=log['g/rev'],
+        x=decimated(log['RPM'], load_idx),
+        y=decimated(log['g/rev'], load_idx),
         mode='lines',
         name='Load vs RPM',
         # line_shape='hvh',
     ))
     fig.add_trace(go.Scatter(line=dict(color='green'),
-                             x=log['RPM'],
-                             y=log['AVCS'],
+                             x=decimated(log['RPM'], avcs_idx),
+                             y=decimated(log['AVCS'], avcs_idx),
                              mode='lines',
                              name='AVCS vs RPM',
                              yaxis='y2'
@@ -251,7 +902,7 @@ def plotLoadvsRPM(log):
                              ))
     fig.add_vline(x=peak_rpm)
     fig.add_trace(
-        go.Scatter(x=[peak_rpm], y=[peak_load], mode='markers+text', name='Peak Load', text=[f'{peak_load} g/rev'],
+        go.Scatter(x=[peak_rpm], y=[peak_load], mode='markers+text', name='Peak Load', text=[f'{peak_load:.2f} g/rev'],
                    textposition='top center', marker=dict(color='red', size=10)))
 
     fig.update_layout(
@@ -264,75 +915,393 @@ def plotLoadvsRPM(log):
     return fig
 
 
-def main():
-    figs = []
-    rom_file = "C:/WRX/wrx_rom_tables.xlsx"
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tuning-assistant")
+# Bumped whenever readTables' output changes, so stale caches are rebuilt
+TABLES_VERSION = 2
 
-    root = Tk()
-    root.withdraw()  # Hide the main tkinter window
-    log_file = fd.askopenfilename(
-        title="Select a RomRaider Log CSV File",
-        filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")]
-    )
-    # log_file = "C:/WRX/Logs/romraiderlog_20251022_081053_wot.csv"
-    if not log_file:
-        print("❌ No log file selected. Exiting.")
-        return
 
-    print(f"📁 Using log file: {log_file}")
+def tablesCacheVersion():
+    # The pickled DataFrames are only safe to load under the pandas and numpy
+    # that wrote them
+    return (TABLES_VERSION, pd.__version__, np.__version__)
 
+
+def fileDigest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@profiled(rows_arg=None)
+def loadTables(rom_file, cache_dir=CACHE_DIR, avcs_sheet="avcs groupn"):
+    # Parsing the workbook through openpyxl dominates startup, so the formatted
+    # tables are pickled and reused until the workbook changes. The cache is
+    # keyed by path; mtime is the fast check and the content hash catches
+    # edits that keep the mtime (or touches that don't change anything).
+    if not cache_dir:
+        return readTables(rom_file, avcs_sheet)
+
+    rom_path = os.path.abspath(rom_file)
+    cache_file = os.path.join(cache_dir, hashlib.sha1(f"{rom_path}|{avcs_sheet}".encode()).hexdigest() + ".pkl")
+    mtime = os.stat(rom_path).st_mtime_ns
+
+    cached = None
+    try:
+        with open(cache_file, "rb") as f:
+            cached = pickle.load(f)
+    except Exception:
+        # Anything a stale or foreign pickle raises (a module or class that
+        # moved in another pandas, a truncated file) just means a rebuild
+        pass
+
+    version = tablesCacheVersion()
+    if isinstance(cached, dict) and cached.get('version') == version and cached.get('path') == rom_path and cached.get('avcs_sheet') == avcs_sheet:
+        if cached['mtime'] == mtime:
+            return cached['tables']
+        digest = fileDigest(rom_path)
+        if cached['sha256'] == digest:
+            cached['mtime'] = mtime
+            writeTablesCache(cache_file, cached)
+            return cached['tables']
+    else:
+        digest = fileDigest(rom_path)
+
+    tables = readTables(rom_file, avcs_sheet)
+    writeTablesCache(cache_file, {'version': version, 'path': rom_path, 'avcs_sheet': avcs_sheet, 'mtime': mtime, 'sha256': digest,
+                                  'tables': tables})
+    return tables
+
+
+def writeTablesCache(cache_file, cached):
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"⚠️ Could not write ROM table cache: {e}")
+
+
+FIGURE_CACHE_DIR = os.path.join(CACHE_DIR, "figures")
+# Bumped when fragments change shape; edits to the figure builders are already
+# caught by builderDigest()
+FIGURE_CACHE_VERSION = 2
+_builder_digest = None
+
+
+def builderDigest():
+    # Hash of this module's source, which holds every figure builder, so any
+    # edit to how a figure is drawn makes its cached fragments miss
+    global _builder_digest
+    if _builder_digest is None:
+        _builder_digest = fileDigest(__file__)
+    return _builder_digest
+
+
+def frameDigest(df):
+    # Hash of a frame's labels and values, for cache keys
+    digest = hashlib.sha1()
+    for labels in (df.index, df.columns):
+        digest.update(repr(labels.tolist()).encode())
+    for name, col in df.items():
+        values = np.ascontiguousarray(col.to_numpy())
+        digest.update(f"{name}:{values.dtype.str}:".encode())
+        digest.update(values.tobytes() if values.dtype != object else repr(values.tolist()).encode())
+    return digest.hexdigest()
+
+
+class FigureCache:
+    # Serialized figure fragments (figureFragment output) on disk, keyed by a
+    # hash of everything the fragment depends on: the run's samples, the one
+    # ROM table behind it, its options and how it is embedded. A hit bumps the
+    # file's mtime, and trim() drops the least recently used fragments once
+    # the directory grows past max_bytes.
+    def __init__(self, cache_dir=FIGURE_CACHE_DIR, max_bytes=512 * 2**20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def key(self, *parts):
+        plotly_version = importlib.import_module("plotly").__version__
+        return hashlib.sha256(repr((FIGURE_CACHE_VERSION, plotly_version, builderDigest()) + parts).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".pkl")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                fragment = pickle.load(f)
+            os.utime(path)
+            return fragment
+        except Exception:
+            # Unreadable or written by an incompatible version: a miss
+            return None
+
+    def put(self, key, fragment):
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_file = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_file, "wb") as f:
+                pickle.dump(fragment, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, path)
+        except OSError as e:
+            print(f"⚠️ Could not write figure cache: {e}")
+
+    def trim(self):
+        entries = []
+        try:
+            for sub in os.scandir(self.cache_dir):
+                if sub.is_dir():
+                    entries.extend((e.stat().st_mtime_ns, e.stat().st_size, e.path) for e in os.scandir(sub.path) if e.name.endswith(".pkl"))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+@profiled(rows_arg=None)
+def cachedFragments(cache, analysis, tables, lazy=False, max_points=None):
+    # Only figures whose inputs changed are rebuilt; the rest are read back
+    # already serialized. Lazy specs don't embed the run number, HTML does.
+    i = analysis.run
+    log_digest = frameDigest(analysis.log)
+    fragments = []
+    for name, table, options, build in runFigureBuilders(analysis, tables, max_points):
+        table_digest = frameDigest(table) if table is not None else None
+        key = cache.key(name, lazy, None if lazy else i, options, log_digest, table_digest)
+        fragment = cache.get(key)
+        if fragment is None:
+            with profiling.stage('buildFigure'):
+                fig = build()
+            fragment = figureFragment(i, name, fig, lazy)
+            cache.put(key, fragment)
+        fragments.append(fragment)
+    return fragments
+
+
+@profiled(rows_arg=None)
+def readTables(rom_file, avcs_sheet="avcs groupn"):
     base_timing = formatTable(pd.read_excel(rom_file, "base timing"))
     knock_advance = formatTable(pd.read_excel(rom_file, "kca"))
     ol_fueling = formatTable(pd.read_excel(rom_file, "ol fueling"))
     boost = formatTable(pd.read_excel(rom_file, "boost"))
-    avcs = formatTable(pd.read_excel(rom_file, "avcs groupn"))
-
-    total_timing = knock_advance + base_timing
-    logs = getWOTruns(pd.read_csv(log_file, low_memory=False))
-    print(f"Number of runs found: {len(logs)}")
-
-    tab_buttons_html = ""
-    tab_panes_html = ""
-
-    for i, log in enumerate(logs, 1):
-        VE = getVE(log)
-
-        # Cell highlighting
-        g, r = getWOTparams(total_timing, log)
-        knock_g, knock_r = getKnocking(total_timing, log)
-        g_avcs, r_avcs = getAVCS(avcs, log)
-
-        used_cells = list(zip(r, g))
-        knock_cells = list(zip(knock_r, knock_g))
-        avcs_cells = list(zip(r_avcs, g_avcs))
-
-        # Build figures
-        fig_boost = plotBoost(log, boost)
-        fig_timing = make_annotated_heatmap(total_timing, "Total Timing Map", colorscale='Spectral_r', used=used_cells, knock=knock_cells)
-        fig_fuel = make_annotated_heatmap(ol_fueling, "Open Loop Fueling Map", colorscale='Spectral', used=used_cells)
-        fig_avcs = make_annotated_heatmap(avcs, "AVCS Map", colorscale='Spectral_r', used=avcs_cells)
-        fig_ve = make_annotated_heatmap(VE, "Volumetric Efficiency (VE)", colorscale='Spectral_r', xaxis_title="VE (%)", not_rev=True)
-        fig_load = plotLoadvsRPM(log)
-
-        figs.extend([fig_timing, fig_fuel, fig_avcs, fig_ve, fig_boost, fig_load])
-
-        # Convert figures to HTML snippets; include plotly.js once (first snippet)
-        timing_html = fig_timing.to_html(full_html=False, include_plotlyjs='cdn' if i==1 else False)
-        fuel_html = fig_fuel.to_html(full_html=False, include_plotlyjs=False)
-        avcs_html = fig_avcs.to_html(full_html=False, include_plotlyjs=False)
-        ve_html = fig_ve.to_html(full_html=False, include_plotlyjs=False)
-        boost_html = fig_boost.to_html(full_html=False, include_plotlyjs=False)
-        load_html = fig_load.to_html(full_html=False, include_plotlyjs=False)
-
-        # Build tab button
-        tab_buttons_html += f"""
+    avcs = formatTable(pd.read_excel(rom_file, avcs_sheet))
+    return romTables(base_timing, knock_advance, ol_fueling, boost, avcs)
+
+
+def romTables(base_timing, knock_advance, ol_fueling, boost, avcs):
+    # The tables dict every analysis function takes, from formatTable tables
+    tables = {
+        'base_timing': base_timing,
+        'knock_advance': knock_advance,
+        'total_timing': knock_advance + base_timing,
+        'ol_fueling': ol_fueling,
+        'boost': boost,
+        'avcs': avcs,
+    }
+    # Interpolation grids are built once here and cached with the tables
+    tables['grids'] = tableGrids(tables)
+    return tables
+
+
+class RunAnalysis(NamedTuple):
+    # Everything the renderers need from one WOT run, computed once by
+    # analyzeRun. The Plotly report, the matplotlib script and the JSON export
+    # share one instance and only read from it. Nothing in it is frozen, so a
+    # renderer that needs to change a frame or array copies it first.
+    run: int                  # 1-based run number within the log
+    log: pd.DataFrame         # the run's samples, lag-aligned if requested
+    summary: dict             # summarizeRun
+    timing: CellHits          # binCells on total_timing
+    fuel: CellHits            # binCells on ol_fueling
+    avcs: CellHits            # binCells on avcs
+    ve: VEGrid                # on total_timing's axes
+    cells: CellStats          # on total_timing's axes
+    targets: pd.DataFrame     # getTargets: commanded value and error per sample
+    knock_events: KnockEvents # contiguous knock episodes
+    boost_target: np.ndarray  # targets['Boost Target']
+
+
+@profiled(rows_arg=1)
+def analyzeRun(i, log, tables, lags=None):
+    if lags:
+        log = alignRun(log, lags)
+    total_timing = tables['total_timing']
+    timing = binCells(total_timing, log)
+    targets = getTargets(log, tables)
+    return RunAnalysis(
+        run=i,
+        log=log,
+        summary=summarizeRun(log),
+        timing=timing,
+        fuel=binCells(tables['ol_fueling'], log),
+        avcs=binCells(tables['avcs'], log),
+        ve=getVE(log, total_timing, timing),
+        cells=getCellStats(log, total_timing, timing),
+        targets=targets,
+        knock_events=getKnockEvents(log, i, timing.knocked),
+        boost_target=targets['Boost Target'].to_numpy(),
+    )
+
+
+def jsonTable(df):
+    # NaN (empty cells) becomes null
+    return {
+        'rpm': df.index.tolist(),
+        'columns': df.columns.tolist(),
+        'values': [[None if np.isnan(v) else round(float(v), 3) for v in row] for row in df.to_numpy(dtype=float)],
+    }
+
+
+def runJson(analysis):
+    # Plain-JSON view of a RunAnalysis for other tools
+    log = analysis.log
+    knocked = analysis.timing.knocked
+    return {
+        'run': analysis.run,
+        'summary': analysis.summary,
+        'time_ms': [float(log['Time'].iloc[0]), float(log['Time'].iloc[-1])] if 'Time' in log.columns else None,
+        'cells': {
+            'samples': jsonTable(cellStatsTable(analysis.cells, 'count')),
+            'knock': jsonTable(cellStatsTable(analysis.cells, 'knock')),
+            'knock_events': jsonTable(cellStatsTable(analysis.cells, 'events')),
+            've': jsonTable(veTable(analysis.ve)),
+        },
+        'knock_samples': {
+            'time_ms': logValues(log, 'Time')[knocked].tolist(),
+            'rpm': logValues(log, 'RPM')[knocked].tolist(),
+            'load': logValues(log, 'g/rev')[knocked].tolist(),
+        },
+        'knock_events': jsonKnockEvents(analysis.knock_events),
+        'boost': {
+            'rpm': logValues(log, 'RPM').tolist(),
+            'boost': logValues(log, 'MRP').tolist(),
+            'target': [round(float(v), 3) for v in analysis.boost_target],
+        },
+        'targets': {name: [None if np.isnan(v) else round(float(v), 3) for v in values]
+                    for name, values in analysis.targets.items()},
+    }
+
+
+FIGURE_NAMES = ('timing', 'fuel', 'avcs', 've', 'boost', 'load')
+
+
+def runFigureBuilders(analysis, tables, max_points=None):
+    # One (name, table, options, build) entry per figure of a run, in page
+    # order. Besides the run's samples, each figure depends only on its one
+    # ROM table and options, which is what the figure cache keys on.
+    log = analysis.log
+    total_timing = tables['total_timing']
+
+    def timing():
+        return make_annotated_heatmap(total_timing, "Total Timing Map", colorscale='Spectral_r', used=analysis.timing.hits, knock=analysis.timing.knock)
+
+    def fuel():
+        return make_annotated_heatmap(tables['ol_fueling'], "Open Loop Fueling Map", colorscale='Spectral', used=analysis.fuel.hits)
+
+    def avcs_map():
+        return make_annotated_heatmap(tables['avcs'], "AVCS Map", colorscale='Spectral_r', used=analysis.avcs.hits)
+
+    def ve_map():
+        return make_annotated_heatmap(veTable(analysis.ve), "Volumetric Efficiency (VE %)", colorscale='Spectral_r')
+
+    def boost():
+        return plotBoost(log, tables['boost'], analysis.boost_target, max_points)
+
+    def load():
+        return plotLoadvsRPM(log, max_points)
+
+    return list(zip(FIGURE_NAMES,
+                    [total_timing, tables['ol_fueling'], tables['avcs'], total_timing, tables['boost'], None],
+                    [None, None, None, None, max_points, max_points],
+                    [timing, fuel, avcs_map, ve_map, boost, load]))
+
+
+@profiled(rows_arg=None)
+def buildRunFigures(analysis, tables, max_points=None):
+    return [build() for _, _, _, build in runFigureBuilders(analysis, tables, max_points)]
+
+
+def plotlyCdnUrl():
+    from plotly.offline import get_plotlyjs_version
+    return f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+
+
+def shareSpec(obj, shared):
+    # Content-addressed: identical specs across runs are stored once per page
+    from plotly.io.json import to_json_plotly
+    data = to_json_plotly(obj)
+    key = hashlib.sha1(data.encode()).hexdigest()[:16]
+    shared.setdefault(key, data)
+    return {'shared': key}
+
+
+def tabButton(i):
+    return f"""
             <button id="tab-btn-run{i}" onclick="openTab('run{i}')" class="{ 'active' if i==1 else '' }">
                 Run {i}
             </button>
         """
 
-        # Build tab content pane
-        tab_panes_html += f"""
+
+def tabButtons(runs):
+    return "".join(tabButton(i) for i in range(1, runs + 1))
+
+
+@profiled(rows_arg=None)
+def figureFragment(i, name, fig, lazy=False):
+    # What one figure contributes to the page: its spec for lazy tabs, or an
+    # HTML snippet with plotly.js included once (first snippet). Fixed div ids
+    # keep the output reproducible byte for byte.
+    if lazy:
+        return fig.to_plotly_json()
+    return fig.to_html(full_html=False, div_id=f"run{i}-{name}", include_plotlyjs='cdn' if i == 1 and name == 'timing' else False)
+
+
+@profiled(rows_arg=None)
+def renderRunTab(i, figs, lazy=False, shared=None):
+    return renderRunPane(i, [figureFragment(i, name, fig, lazy) for name, fig in zip(FIGURE_NAMES, figs)], lazy, shared)
+
+
+def renderRunPane(i, fragments, lazy=False, shared=None):
+    if lazy:
+        from plotly.io.json import to_json_plotly
+
+        # Only empty divs plus the figure specs as JSON; renderPane() builds
+        # the charts the first time the tab is opened. With a shared dict the
+        # map heatmaps and the layout template, which are the same for every
+        # run, are written once per page and referenced from here.
+        timing_html, fuel_html, avcs_html, ve_html, boost_html, load_html = [f'<div id="fig-run{i}-{k}"></div>' for k in range(len(fragments))]
+        specs = fragments
+        if shared is not None:
+            for spec in specs:
+                spec['data'] = [shareSpec(t, shared) if t['type'] == 'heatmap' else t for t in spec['data']]
+                if 'template' in spec['layout']:
+                    spec['layout']['template'] = shareSpec(spec['layout']['template'], shared)
+        specs = to_json_plotly(specs).replace("</", "<\\/")
+        spec_html = f'<script type="application/json" id="spec-run{i}">{specs}</script>'
+        if i == 1:
+            spec_html = f'<script charset="utf-8" src="{plotlyCdnUrl()}"></script>' + spec_html
+    else:
+        timing_html, fuel_html, avcs_html, ve_html, boost_html, load_html = fragments
+        spec_html = ""
+
+    tab_button_html = tabButton(i)
+
+    # Build tab content pane
+    tab_pane_html = f"""
         <div id="pane-run{i}" class="chart-pane { 'active' if i==1 else '' }">
             <div class="grid-timing">
                 <!-- Row 1 -->
@@ -347,11 +1316,15 @@ def main():
                 <div class="map">{boost_html}</div>
                 <div class="map">{load_html}</div>
             </div>
+            {spec_html}
         </div>
         """
+    return tab_button_html, tab_pane_html
 
-    # Combine into final page
-    page_html = f"""
+
+def reportHeader(tab_buttons_html):
+    # Everything before the run panes; reportFooter() closes the page
+    return f"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -410,8 +1383,18 @@ def main():
       </div>
 
       <div class="tab-content">
-        {tab_panes_html}
+        """
+
+
+def reportFooter(shared=None):
+    shared_html = ""
+    if shared:
+        shared_json = ("{" + ",".join(f'"{k}":{v}' for k, v in shared.items()) + "}").replace("</", "<\\/")
+        shared_html = f'<script type="application/json" id="shared-specs">{shared_json}</script>'
+
+    return f"""
       </div>
+      {shared_html}
 
       <script>
         function openTab(name) {{
@@ -424,27 +1407,322 @@ def main():
           document.getElementById('pane-' + name).classList.add('active');
           document.getElementById('tab-btn-' + name).classList.add('active');
 
+          renderPane(name);
+
           // resize Plotly charts on tab switch
           setTimeout(() => {{
             if (window.Plotly) {{
-              document.querySelectorAll('[id^="plotly"]').forEach(gd => {{
+              document.querySelectorAll('.js-plotly-plot').forEach(gd => {{
                 try {{ Plotly.Plots.resize(gd); }} catch(e){{}}
               }});
             }}
           }}, 80);
         }}
+
+        // Lazy reports ship each run's figures as JSON and build them on first view
+        let sharedSpecs = null;
+        function resolveShared(obj) {{
+          if (!obj || !obj.shared) return obj;
+          if (sharedSpecs === null) {{
+            sharedSpecs = JSON.parse(document.getElementById('shared-specs').textContent);
+          }}
+          // Plotly mutates what it is given, so every pane gets its own copy
+          return structuredClone(sharedSpecs[obj.shared]);
+        }}
+
+        function renderPane(name) {{
+          const spec = document.getElementById('spec-' + name);
+          if (!spec || spec.dataset.rendered) return;
+          spec.dataset.rendered = '1';
+          JSON.parse(spec.textContent).forEach((fig, k) => {{
+            const data = fig.data.map(resolveShared);
+            const layout = {{...fig.layout, template: resolveShared(fig.layout.template)}};
+            Plotly.newPlot('fig-' + name + '-' + k, data, layout, {{responsive: true}});
+          }});
+        }}
+
+        document.addEventListener('DOMContentLoaded', () => {{
+          const active = document.querySelector('.chart-pane.active');
+          if (active) renderPane(active.id.replace('pane-', ''));
+        }});
       </script>
     </body>
     </html>
     """
 
 
-    # Save HTML
-    out_file = "c:\\wrx\\logs\\wrx_analysis.html"
+@profiled(rows_arg=None)
+def writeReport(out_file, tab_buttons_html, tab_panes_html, shared=None):
     with open(out_file, "w", encoding="utf-8") as f:
-        f.write(page_html)
+        f.write(reportHeader(tab_buttons_html))
+        f.write(tab_panes_html)
+        f.write(reportFooter(shared))
+
+
+class ReportWriter:
+    # Writes a report while its runs are still being rendered, so only the
+    # run in hand is ever held in memory. With the run count known up front
+    # the header goes out first and each pane straight after it; otherwise
+    # panes are spooled to a temporary file until close() knows how many tab
+    # buttons the header needs. The page appears at out_file only once
+    # complete.
+    def __init__(self, out_file, runs=None):
+        import tempfile
+
+        self.out_file = out_file
+        self.runs = runs
+        self.count = 0
+        self.shared = {}
+        self.tmp_file = f"{out_file}.{os.getpid()}.tmp"
+        self.f = open(self.tmp_file, "w", encoding="utf-8")
+        if runs is not None:
+            self.f.write(reportHeader(tabButtons(runs)))
+            self.panes = self.f
+        else:
+            self.panes = tempfile.TemporaryFile("w+", encoding="utf-8")
+
+    def add(self, tab_pane_html, run_shared=None):
+        # Shared specs are merged in run order, so the page is identical
+        # however the runs were rendered
+        self.count += 1
+        self.panes.write(tab_pane_html)
+        for key, spec in (run_shared or {}).items():
+            self.shared.setdefault(key, spec)
+
+    def close(self):
+        import shutil
+
+        with profiling.stage('writeReport'):
+            if self.panes is not self.f:
+                self.f.write(reportHeader(tabButtons(self.count)))
+                self.panes.seek(0)
+                shutil.copyfileobj(self.panes, self.f)
+                self.panes.close()
+            self.f.write(reportFooter(self.shared))
+            self.f.close()
+            os.replace(self.tmp_file, self.out_file)
+
+    def discard(self):
+        if self.panes is not self.f:
+            self.panes.close()
+        self.f.close()
+        os.remove(self.tmp_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def summarizeRun(log):
+    return {
+        'samples': len(log),
+        'knock_samples': int(knockMask(log).sum()),
+        # rounded so float32 columns don't leak noise digits into exports
+        'peak_boost': round(float(log['MRP'].max()), 4),
+        'peak_load': round(float(log['g/rev'].max()), 4),
+        'max_rpm': round(float(log['RPM'].max()), 4),
+    }
+
+
+def renderRun(analysis, tables, lazy=False, max_points=None, cache=None):
+    i = analysis.run
+    shared = {} if lazy else None
+    if cache is None:
+        tab_button_html, tab_pane_html = renderRunTab(i, buildRunFigures(analysis, tables, max_points), lazy, shared)
+    else:
+        tab_button_html, tab_pane_html = renderRunPane(i, cachedFragments(cache, analysis, tables, lazy, max_points), lazy, shared)
+    return tab_button_html, tab_pane_html, shared
+
+
+_worker_tables = None
+
+
+def _initRenderWorker(tables):
+    global _worker_tables
+    _worker_tables = tables
+
+
+def _renderRunWorker(analysis, lazy, max_points, cache):
+    return renderRun(analysis, _worker_tables, lazy, max_points, cache)
+
+
+def renderRunsParallel(items, tables, lazy=False, workers=None, max_points=None, cache=None):
+    # Figure building and serialization are pure Python, so runs are spread
+    # over processes. Results come back in run order and at most two runs per
+    # worker are in flight.
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initRenderWorker, initargs=(tables,)) as pool:
+        for analysis in items:
+            pending.append(pool.submit(_renderRunWorker, analysis, lazy, max_points, cache))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+@profiled(rows_arg=None)
+def analyzeLog(log_file, tables, out_file, chunksize=None, use_store=False, lazy=False, workers=None, max_points=None, cache=None, lags=None,
+               json_file=None):
+    # chunksize streams the log so only one run is held in memory at a time;
+    # use_store reopens the columnar copy of the log instead of parsing the CSV;
+    # lazy defers building each tab's charts until it is first opened;
+    # workers renders the runs' figures in that many processes;
+    # max_points caps the samples drawn per boost/load trace;
+    # cache (a FigureCache) reuses figures whose inputs haven't changed;
+    # lags ({channel: ms} or 'auto' to estimate them from the log's runs)
+    # shifts lagging sensors into line before anything is computed;
+    # json_file also writes every run's analysis (runJson) as a JSON list.
+    # Each run is analyzed once (analyzeRun) and every output reads from that.
+    def openRuns():
+        if use_store:
+            from logstore import loadLogRuns
+            return loadLogRuns(log_file)
+        if chunksize:
+            return iterWOTruns(log_file, chunksize)
+        with profiling.stage('read_csv'):
+            df = readLog(log_file)
+        return getWOTruns(df)
+
+    logs = openRuns()
+    if lags == 'auto':
+        # A streamed log is passed over once more, so it is never held whole
+        with profiling.stage('estimateLags'):
+            lags = estimateLags(logs if isinstance(logs, list) else openRuns())
+        for name, lag in lags.items():
+            spread = "a single run" if np.isnan(lag.spread_ms) else f"runs disagree by {lag.spread_ms:.0f} ms"
+            print(f"⏱️ {name} lags {LAG_CHANNELS[name]} by {lag.lag_ms:.0f} ms (r={lag.r:.2f}, {spread})"
+                  + ("" if lagApplies(lag) else ", too uncertain to apply"))
+        lags = {name: lag for name, lag in lags.items() if lagApplies(lag)}
+
+    runs = []
+    json_out = open(json_file, "w", encoding="utf-8") if json_file else None
+
+    def analyzedRuns():
+        for i, log in enumerate(logs, 1):
+            profiling.setRun(i)
+            analysis = analyzeRun(i, log, tables, lags)
+            runs.append(dict(analysis.summary, ve=analysis.ve, cells=analysis.cells, knock_events=analysis.knock_events))
+            if json_out:
+                json_out.write(("[" if i == 1 else ",") + "\n" + json.dumps(runJson(analysis)))
+            yield analysis
+        profiling.setRun(None)
+
+    if workers and workers > 1:
+        rendered = renderRunsParallel(analyzedRuns(), tables, lazy, workers, max_points, cache)
+    else:
+        rendered = (renderRun(analysis, tables, lazy, max_points, cache) for analysis in analyzedRuns())
+
+    try:
+        with ReportWriter(out_file, len(logs) if isinstance(logs, list) else None) as report:
+            for _, tab_pane_html, run_shared in rendered:
+                report.add(tab_pane_html, run_shared)
+    finally:
+        if json_out:
+            json_out.write("\n]\n" if runs else "[]\n")
+            json_out.close()
+    if cache is not None:
+        cache.trim()
+    return runs
+
+
+def wbo2Lags(value):
+    # --wbo2-lag as analyzeLog's lags argument
+    if value is None or value == 'auto':
+        return value
+    return {'WBO2': float(value)}
+
+
+def pickLogFile():
+    from tkinter import filedialog as fd
+    from tkinter import Tk
 
-    print(f"✅ Saved WRX analysis to {out_file}")
+    root = Tk()
+    root.withdraw()  # Hide the main tkinter window
+    log_file = fd.askopenfilename(
+        title="Select a RomRaider Log CSV File",
+        filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")]
+    )
+    root.destroy()
+    return log_file
+
+
+def checkRom(parser, rom_path):
+    """Stop with a usage error unless the ROM workbook exists."""
+    if not os.path.isfile(rom_path):
+        parser.error(f"ROM workbook not found: {rom_path} (pass --rom)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an interactive WOT run report from RomRaider logs.")
+    parser.add_argument("logs", nargs="*", help="RomRaider CSV log(s); opens a file picker when omitted")
+    parser.add_argument("--rom", default="C:/WRX/wrx_rom_tables.xlsx", help="ROM tables workbook")
+    parser.add_argument("--out", default=None,
+                        help="report file (default: wrx_analysis.html next to the log); a directory when several logs are given")
+    parser.add_argument("--pick", action="store_true", help="choose the log with a file picker")
+    parser.add_argument("--chunksize", type=int, default=None, help="stream the log in chunks of this many rows")
+    parser.add_argument("--store", action="store_true", help="reuse the columnar copy of the log instead of re-parsing the CSV")
+    parser.add_argument("--lazy", action="store_true", help="build each run's charts only when its tab is first opened")
+    parser.add_argument("--workers", type=int, default=None, help="render runs in this many processes")
+    parser.add_argument("--max-points", type=int, default=None, help="decimate each boost/load trace to about this many points")
+    parser.add_argument("--wbo2-lag", default=None, metavar="MS|auto",
+                        help="shift the wideband earlier by this many ms, or 'auto' to estimate the lag from the log")
+    parser.add_argument("--json", action="store_true", help="also write each run's analysis next to the report as JSON")
+    parser.add_argument("--no-cache", action="store_true", help="always re-read the ROM workbook and rebuild every figure")
+    parser.add_argument("--cache-size", type=int, default=512, help="figure cache size limit in MiB")
+    parser.add_argument("--profile", metavar="TRACE", default=os.environ.get("WRX_PROFILE"),
+                        help="record per-stage timings and memory to this JSON trace")
+    args = parser.parse_args(argv)
+    if args.pick and args.logs:
+        parser.error("--pick cannot be combined with log files")
+    checkRom(parser, args.rom)
+
+    log_files = list(args.logs)
+    if not log_files:
+        log_file = pickLogFile()
+        if not log_file:
+            print("❌ No log file selected. Exiting.")
+            return
+        log_files = [log_file]
+
+    if len(log_files) == 1 and not (args.out and os.path.isdir(args.out)):
+        out_files = [args.out or os.path.join(os.path.dirname(os.path.abspath(log_files[0])), "wrx_analysis.html")]
+    else:
+        out_dir = args.out
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        out_files = [
+            os.path.join(out_dir or os.path.dirname(os.path.abspath(f)), os.path.splitext(os.path.basename(f))[0] + ".html")
+            for f in log_files
+        ]
+
+    if args.profile:
+        profiling.enable()
+
+    tables = loadTables(args.rom, cache_dir=None if args.no_cache else CACHE_DIR)
+    cache = None if args.no_cache else FigureCache(max_bytes=args.cache_size * 2**20)
+
+    for log_file, out_file in zip(log_files, out_files):
+        print(f"📁 Using log file: {log_file}")
+        json_file = os.path.splitext(out_file)[0] + ".json" if args.json else None
+        runs = analyzeLog(log_file, tables, out_file, args.chunksize, args.store, args.lazy, args.workers, args.max_points, cache,
+                          wbo2Lags(args.wbo2_lag), json_file)
+        print(f"Number of runs found: {len(runs)}")
+        print(f"✅ Saved WRX analysis to {out_file}")
+        if json_file:
+            print(f"✅ Saved run data to {json_file}")
+
+    if args.profile:
+        profiler = profiling.disable()
+        profiler.writeTrace(args.profile)
+        profiler.printSummary()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,150 @@
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+# Opt-in per-stage instrumentation. Functions in main.py are wrapped with
+# @profiled and the pipeline marks extra stages with `with stage(...)`. Until
+# enable() is called both reduce to a global lookup and a plain call.
+_profiler = None
+_disabled = nullcontext()
+
+
+class Profiler:
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.events = []
+        self.stack = []
+        self.run = None
+        self.origin = time.perf_counter()
+        self.started_tracing = memory and not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        # tracemalloc has a single peak counter, so a parent's peak is saved
+        # before a child resets it and folded back in when the child exits
+        frame = {'peak': 0, 'mem': 0}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.stack:
+                self.stack[-1]['peak'] = max(self.stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['mem'] = current
+        self.stack.append(frame)
+
+        start, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - start, time.process_time() - cpu
+            self.stack.pop()
+            event = {
+                'stage': name,
+                'run': self.run,
+                'rows': rows,
+                'depth': len(self.stack),
+                'start_s': start - self.origin,
+                'wall_s': wall,
+                'cpu_s': cpu,
+            }
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame['peak'])
+                event['alloc_bytes'] = current - frame['mem']
+                event['peak_bytes'] = peak - frame['mem']
+                if self.stack:
+                    self.stack[-1]['peak'] = max(self.stack[-1]['peak'], peak)
+            self.events.append(event)
+
+    def summary(self):
+        totals = {}
+        for e in self.events:
+            t = totals.setdefault(e['stage'], {'stage': e['stage'], 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0, 'peak_bytes': 0})
+            t['calls'] += 1
+            t['wall_s'] += e['wall_s']
+            t['cpu_s'] += e['cpu_s']
+            t['rows'] += e['rows'] or 0
+            t['peak_bytes'] = max(t['peak_bytes'], e.get('peak_bytes') or 0)
+        return sorted(totals.values(), key=lambda t: t['wall_s'], reverse=True)
+
+    def writeTrace(self, trace_file):
+        # Chrome trace event format, so it opens in chrome://tracing / Perfetto
+        pid = os.getpid()
+        trace = {
+            'traceEvents': [{
+                'name': e['stage'],
+                'ph': 'X',
+                'ts': e['start_s'] * 1e6,
+                'dur': e['wall_s'] * 1e6,
+                'pid': pid,
+                'tid': 0,
+                'args': {k: v for k, v in e.items() if k not in ('stage', 'start_s', 'wall_s')},
+            } for e in self.events],
+            'stages': self.events,
+            'summary': self.summary(),
+        }
+        with open(trace_file, "w", encoding="utf-8") as f:
+            json.dump(trace, f, indent=1)
+
+    def printSummary(self):
+        print(f"{'stage':<24}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'rows':>12}{'peak MiB':>10}")
+        for t in self.summary():
+            print(f"{t['stage']:<24}{t['calls']:>7}{t['wall_s']:>10.3f}{t['cpu_s']:>10.3f}{t['rows']:>12}{t['peak_bytes'] / 2**20:>10.1f}")
+
+    def close(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+
+
+def enable(memory=True):
+    global _profiler
+    _profiler = Profiler(memory)
+    return _profiler
+
+
+def disable():
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.close()
+    return profiler
+
+
+def setRun(run):
+    if _profiler is not None:
+        _profiler.run = run
+
+
+def stage(name, rows=None):
+    if _profiler is None:
+        return _disabled
+    return _profiler.stage(name, rows)
+
+
+def rowCount(obj):
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+def profiled(fn=None, rows_arg=0):
+    # rows_arg picks the positional argument whose length is recorded as the
+    # stage's row count (the log rather than the ROM table, for example), or
+    # None when no argument has meaningful rows
+    if fn is None:
+        return functools.partial(profiled, rows_arg=rows_arg)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _profiler is None:
+            return fn(*args, **kwargs)
+        rows = rowCount(args[rows_arg]) if rows_arg is not None and len(args) > rows_arg else None
+        with _profiler.stage(fn.__name__, rows):
+            return fn(*args, **kwargs)
+    return wrapper
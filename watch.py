@@ -0,0 +1,119 @@
+import argparse
+import os
+import pickle
+import time
+
+import batch
+import main as wrx
+
+
+MANIFEST_NAME = "manifest.pkl"
+
+
+def loadManifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        # Missing, truncated or from an incompatible version: start over
+        return {}
+
+
+def saveManifest(out_dir, manifest):
+    manifest_file = os.path.join(out_dir, MANIFEST_NAME)
+    tmp_file = f"{manifest_file}.tmp"
+    with open(tmp_file, "wb") as f:
+        pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, manifest_file)
+
+
+def fileStamp(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def findChanged(log_files, manifest, settling, rom_digest):
+    # A log is picked up once its size and mtime hold still for one poll, so a
+    # file RomRaider is still writing isn't analyzed half-finished. Files whose
+    # stamp moved but whose content hash didn't (copies, touches) are skipped.
+    # Everything is redone when the reports were built from a different ROM.
+    changed = []
+    for log_file in log_files:
+        stamp = fileStamp(log_file)
+        entry = manifest.get(log_file)
+        if entry and entry['rom'] != rom_digest:
+            changed.append((log_file, stamp, wrx.fileDigest(log_file)))
+            continue
+        if entry and entry['stamp'] == stamp:
+            settling.pop(log_file, None)
+            continue
+        if settling.get(log_file) != stamp:
+            settling[log_file] = stamp
+            continue
+        del settling[log_file]
+
+        digest = wrx.fileDigest(log_file)
+        if entry and entry['sha256'] == digest:
+            entry['stamp'] = stamp
+            continue
+        changed.append((log_file, stamp, digest))
+    return changed
+
+
+def poll(target, tables, rom_digest, out_dir, manifest, settling, workers=None, **options):
+    log_files = batch.findLogs(target)
+    removed = set(manifest) - set(log_files)
+    for log_file in removed:
+        del manifest[log_file]
+
+    changed = findChanged(log_files, manifest, settling, rom_digest)
+    if not changed and not removed:
+        return False
+
+    stamps = {log_file: (stamp, digest) for log_file, stamp, digest in changed}
+    for log_file, out_file, runs, error in batch.runBatch(list(stamps), tables, out_dir, workers=workers, **options):
+        stamp, digest = stamps[log_file]
+        manifest[log_file] = {'stamp': stamp, 'sha256': digest, 'rom': rom_digest, 'out_file': out_file, 'runs': runs, 'error': error}
+
+    saveManifest(out_dir, manifest)
+    results = [(log_file, e['out_file'], e['runs'], e['error']) for log_file, e in sorted(manifest.items())]
+    batch.writeIndex(out_dir, results)
+    return True
+
+
+def watch(target, rom_file, out_dir, interval=2.0, workers=None, **options):
+    os.makedirs(out_dir, exist_ok=True)
+    tables = wrx.loadTables(rom_file)
+    rom_digest = wrx.fileDigest(rom_file)
+    manifest = loadManifest(out_dir)
+    settling = {}
+    print(f"👀 Watching {target} ({len(manifest)} logs already processed). Ctrl+C to stop.")
+    try:
+        while True:
+            if poll(target, tables, rom_digest, out_dir, manifest, settling, workers, **options):
+                print(f"✅ Updated {os.path.join(out_dir, 'index.html')}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze new or changed RomRaider logs as they land in a folder.")
+    parser.add_argument("logs", help="directory of CSV logs or a glob such as 'Logs/*_wot.csv'")
+    parser.add_argument("--rom", default="C:/WRX/wrx_rom_tables.xlsx", help="ROM tables workbook")
+    parser.add_argument("--out", default="reports", help="output directory for the reports, manifest and index.html")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between folder scans")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--lazy", action="store_true", help="build each run's charts only when its tab is first opened")
+    parser.add_argument("--max-points", type=int, default=None, help="decimate each boost/load trace to about this many points")
+    parser.add_argument("--wbo2-lag", default=None, metavar="MS|auto",
+                        help="shift the wideband earlier by this many ms, or 'auto' to estimate the lag per log")
+    args = parser.parse_args()
+    wrx.checkRom(parser, args.rom)
+
+    watch(args.logs, args.rom, args.out, interval=args.interval, workers=args.workers, lazy=args.lazy, max_points=args.max_points,
+          cache=wrx.FigureCache(), lags=wrx.wbo2Lags(args.wbo2_lag))
+
+
+if __name__ == "__main__":
+    main()